@@ -1,24 +1,27 @@
 import streamlit as st
-import yfinance as yf
-import pandas as pd
-import numpy as np
+from data_cache import CachedTicker
+from instrumentation import TRACE_ENABLED, debug_panel, finish_run, span, start_run
+from valuation import calculate_fair_value
 
-# Function to calculate fair value using DCF
-def calculate_fair_value(fcf, growth_rate, discount_rate, terminal_growth_rate, years=5):
-    fcf_list = [fcf * (1 + growth_rate)**i for i in range(1, years + 1)]
-    terminal_value = fcf_list[-1] * (1 + terminal_growth_rate) / (discount_rate - terminal_growth_rate)
-    discounted_fcf = [fcf / (1 + discount_rate)**i for i, fcf in enumerate(fcf_list, start=1)]
-    discounted_terminal_value = terminal_value / (1 + discount_rate)**years
-    fair_value = sum(discounted_fcf) + discounted_terminal_value
-    return fair_value
+# Function to render the sensitivity heatmap as PNG bytes, memoized on the table so reruns
+# that leave the grid unchanged skip matplotlib entirely
+@st.cache_data(max_entries=32, show_spinner=False)
+def sensitivity_heatmap(table, title):
+    from sensitivity import sensitivity_heatmap_png
+    return sensitivity_heatmap_png(table, title)
 
 # Streamlit interface
+# Time each stage of this run when tracing is on (DCF_TRACE=1) or the URL has ?debug=1
+start_run('DCF1', TRACE_ENABLED or st.query_params.get('debug') == '1')
 st.title('Enhanced Stock Fair Value Calculator')
 
 ticker = st.text_input('Enter stock ticker', 'AAPL')
 if ticker:
-    stock = yf.Ticker(ticker)
-    info = stock.info
+    stock = CachedTicker(ticker)
+    # Request info, history and financials concurrently; each section below waits only for its own data
+    pending = stock.prefetch(period='5y')
+    with span('fetch', 'info'):
+        info = pending['info'].result()
     
     st.subheader(f'{info["shortName"]} ({ticker})')
     
@@ -29,13 +32,19 @@ if ticker:
     
     # Historical data
     st.subheader('Historical Data')
-    hist = stock.history(period='5y')
-    st.line_chart(hist['Close'])
+    with st.spinner('Loading price history...'):
+        with span('fetch', 'history'):
+            hist = pending['history'].result()
+    with span('render', 'price chart'):
+        st.line_chart(hist['Close'])
     
     # Financials
     st.subheader('Financials')
-    financials = stock.financials.transpose()
-    st.write(financials)
+    with st.spinner('Loading financials...'):
+        with span('fetch', 'financials'):
+            financials = pending['financials'].result().transpose()
+    with span('render', 'financials'):
+        st.write(financials)
 
         # Explanation of Inputs
     st.subheader('Explanation of Inputs for DCF')
@@ -63,7 +72,37 @@ if ticker:
     terminal_growth_rate = st.slider('Terminal Growth Rate (%)', 0, 5, 3) / 100
 
     if st.button('Calculate Fair Value'):
-        fair_value = calculate_fair_value(fcf, growth_rate, discount_rate, terminal_growth_rate)
+        with span('valuation', 'fair value'):
+            fair_value = calculate_fair_value(fcf, growth_rate, discount_rate, terminal_growth_rate)
         fair_value_per_share = fair_value*1000000000 / info['sharesOutstanding']
         st.write(f'**Calculated Fair Value:** ${fair_value:.2f} billion')
         st.write(f'**Fair Value per Share:** ${fair_value_per_share:.2f}')
+
+    # Sensitivity of fair value per share to the discount and terminal growth rates
+    st.subheader('Sensitivity Analysis')
+    if st.checkbox('Show sensitivity heatmap'):
+        # Numerical and plotting modules are only needed here, so they are not loaded on cold start
+        import numpy as np
+        from functools import partial
+        from dcf_engine import FADES, calculate_multistage_value
+        from sensitivity import sensitivity_table
+        discount_range = st.slider('Discount rate range (%)', 1.0, 20.0, (6.0, 12.0))
+        terminal_range = st.slider('Terminal growth rate range (%)', 0.0, 6.0, (1.0, 4.0))
+        grid_size = st.slider('Grid points per axis', 5, 200, 9)
+        fade_years = st.slider('Years to fade from FCF growth to terminal growth (0 = single stage)', 0, 10, 0)
+        fade = st.selectbox('Fade shape', FADES)
+        # The single-stage model is the sensitivity module's default
+        value_function = None
+        if fade_years:
+            value_function = partial(calculate_multistage_value, fade_years=fade_years, fade=fade, first_year_growth=True)
+        discount_rates = np.linspace(*discount_range, grid_size) / 100
+        terminal_growth_rates = np.linspace(*terminal_range, grid_size) / 100
+        with span('valuation', 'sensitivity grid'):
+            table = sensitivity_table(fcf, growth_rate, discount_rates, terminal_growth_rates,
+                                      scale=1000000000 / info['sharesOutstanding'], value_function=value_function)
+        with span('render', 'sensitivity heatmap'):
+            st.image(sensitivity_heatmap(table, f'Fair Value per Share at {growth_rate:.0%} FCF Growth'))
+
+run = finish_run()
+if run:
+    debug_panel(run)
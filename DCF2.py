@@ -1,51 +1,48 @@
+import datetime
+import io
 import streamlit as st
-import yfinance as yf
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-from scipy.optimize import minimize
+from data_cache import CachedTicker
+from dcf_engine import PERIODS_PER_YEAR, calculate_dcf_dated, cash_flow_schedule, stub_period
+from instrumentation import TRACE_ENABLED, debug_panel, finish_run, span, start_run
+from price_store import PriceStore
+from reverse_dcf import implied_growth_rate, implied_wacc
+from valuation import calculate_wacc, calculate_ps_valuation
 
-# Function to fetch stock data
+# Function to fetch stock data (served from the on-disk cache while fresh)
 def get_stock_data(ticker):
-    stock = yf.Ticker(ticker)
+    stock = CachedTicker(ticker)
     return stock
 
-# Function to calculate WACC
-def calculate_wacc(equity_value, debt_value, cost_of_equity, cost_of_debt, tax_rate):
-    total_value = equity_value + debt_value
-    wacc = (equity_value / total_value) * cost_of_equity + (debt_value / total_value) * cost_of_debt * (1 - tax_rate)
-    return wacc
-
-# Function to calculate DCF
-def calculate_dcf(fcf, growth_rate, wacc, terminal_growth_rate, num_years):
-    discounted_fcf = []
-    for i in range(num_years):
-        discounted_fcf.append(fcf / ((1 + wacc) ** (i + 1)))
-        fcf = fcf * (1 + growth_rate)
-    
-    terminal_value = (fcf * (1 + terminal_growth_rate)) / (wacc - terminal_growth_rate)
-    discounted_terminal_value = terminal_value / ((1 + wacc) ** num_years)
-    
-    total_value = sum(discounted_fcf) + discounted_terminal_value
-    return total_value, discounted_fcf, terminal_value
+# Function to open the local price store shared by all sessions
+@st.cache_resource
+def get_price_store():
+    return PriceStore()
 
-# Function to calculate alternative valuation using Price to Sales ratio
-def calculate_ps_valuation(sales, industry_ps_ratio):
-    return sales * industry_ps_ratio
+# Functions to load info and price history, memoized across reruns and sessions
+# History is read from the local price store, which only downloads bars it does not have yet.
+@st.cache_data(ttl=15 * 60, show_spinner=False)
+def load_info(ticker):
+    return get_stock_data(ticker).info
 
-# Streamlit interface
-st.title('Stock Fair Value Calculator')
+@st.cache_data(ttl=15 * 60, show_spinner=False)
+def load_history(ticker, period='5y'):
+    return get_price_store().history(ticker, period)
 
-ticker = st.text_input('Enter stock ticker', 'AAPL')
+# Function to estimate revenue and FCF growth from the ticker's annual statements, memoized per ticker
+# Uses the same vectorized estimator as snapshot screening, on a universe of one.
+@st.cache_data(ttl=15 * 60, show_spinner=False)
+def load_growth_estimates(ticker):
+    from backtest import load_fundamentals
+    from growth import estimate_growth
+    report_dates, columns = load_fundamentals(get_stock_data(ticker))
+    estimates = estimate_growth({field: columns[field][None, :] for field in ('revenue', 'fcf')}, report_dates[None, :])
+    return {name: values[0] for name, values in estimates.items()}
 
-if ticker:
-    stock = get_stock_data(ticker)
-    info = stock.info
-    
-    st.header(f"{info.get('shortName', 'N/A')} ({ticker})")
-    
-    # Display key metrics
-    st.subheader('Key Metrics')
+# Function to build the key metrics table, memoized on the ticker's info
+@st.cache_data(show_spinner=False)
+def key_metrics_table(info):
     metrics = {
         'Previous Close': info.get('previousClose', 'N/A'),
         'Market Cap': info.get('marketCap', 'N/A'),
@@ -56,7 +53,64 @@ if ticker:
         'Price to Book Ratio': info.get('priceToBook', 'N/A'),
         'Dividend Yield': info.get('dividendYield', 'N/A'),
     }
-    st.table(pd.DataFrame(metrics.items(), columns=['Metric', 'Value']))
+    return pd.DataFrame(metrics.items(), columns=['Metric', 'Value'])
+
+# Function to build the historical metrics table from annual statements, memoized on the ticker and its info
+@st.cache_data(ttl=15 * 60, show_spinner=False)
+def historical_metrics_table(ticker, info):
+    growth = load_growth_estimates(ticker)
+    profit_margin = info.get('profitMargins', np.nan) * 100
+    fcf_margin = (info.get('freeCashflow', np.nan) / info.get('totalRevenue', np.nan)) * 100 if info.get('freeCashflow') and info.get('totalRevenue') else np.nan
+    hist_metrics = {
+        'Revenue Growth (CAGR)': growth['revenue_cagr'] * 100,
+        'Revenue Growth (Trend)': growth['revenue_trend_growth'] * 100,
+        'Revenue Growth Volatility': growth['revenue_growth_volatility'] * 100,
+        'Free Cash Flow Growth (CAGR)': growth['fcf_cagr'] * 100,
+        'Free Cash Flow Growth (Trend)': growth['fcf_trend_growth'] * 100,
+        'Free Cash Flow Growth Volatility': growth['fcf_growth_volatility'] * 100,
+        'Profit Margin': profit_margin,
+        'Free Cash Flow Margin': fcf_margin,
+    }
+    return pd.DataFrame(hist_metrics.items(), columns=['Metric', 'Value (%)'])
+
+# Function to draw a projected FCF schedule as PNG bytes, memoized on its inputs so reruns skip
+# both plotting and image encoding. The figure is built without pyplot, so it is never registered
+# in pyplot's global figure list and is freed as soon as the PNG is written.
+@st.cache_data(max_entries=64, show_spinner=False)
+def fcf_schedule_chart(schedule, frequency):
+    from matplotlib.figure import Figure
+    from matplotlib.ticker import MaxNLocator
+    fig = Figure()
+    ax = fig.subplots()
+    period_name = {'annual': 'Year', 'quarterly': 'Quarter', 'monthly': 'Month'}[frequency]
+    periods = [f'{period_name[0]}{i + 1}' for i in range(len(schedule))]
+    ax.plot(periods, schedule, marker='o')
+    ax.set_title(f'{frequency.capitalize()} Free Cash Flows')
+    ax.set_xlabel(period_name)
+    ax.set_ylabel('Free Cash Flow ($)')
+    # Keep the axis readable on long monthly schedules
+    ax.xaxis.set_major_locator(MaxNLocator(20))
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format='png', bbox_inches='tight')
+    return buffer.getvalue()
+
+# Streamlit interface
+# Time each stage of this run when tracing is on (DCF_TRACE=1) or the URL has ?debug=1
+start_run('DCF2', TRACE_ENABLED or st.query_params.get('debug') == '1')
+st.title('Stock Fair Value Calculator')
+
+ticker = st.text_input('Enter stock ticker', 'AAPL')
+
+if ticker:
+    with span('fetch', 'info'):
+        info = load_info(ticker)
+    
+    st.header(f"{info.get('shortName', 'N/A')} ({ticker})")
+    
+    # Display key metrics
+    st.subheader('Key Metrics')
+    with span('render', 'key metrics'):
+        st.table(key_metrics_table(info))
     
     # Check if both PE ratio and FCF are negative
     pe_ratio = info.get('trailingPE', None)
@@ -88,20 +142,12 @@ if ticker:
         """)
 
     else:
-        # Fetch historical data for growth rates
-        hist = stock.history(period="5y")
-        revenue_growth = (hist['Close'].pct_change().mean()) * 100
-        profit_margin = info.get('profitMargins', np.nan) * 100
-        fcf_margin = (info.get('freeCashflow', np.nan) / info.get('totalRevenue', np.nan)) * 100 if info.get('freeCashflow') and info.get('totalRevenue') else np.nan
-        
         # Historic metrics table
         st.subheader('Historical Metrics')
-        hist_metrics = {
-            'Revenue Growth (5y Avg)': revenue_growth,
-            'Profit Margin': profit_margin,
-            'Free Cash Flow Margin': fcf_margin,
-        }
-        st.table(pd.DataFrame(hist_metrics.items(), columns=['Metric', 'Value (%)']))
+        with span('transform', 'historical metrics'):
+            table = historical_metrics_table(ticker, info)
+        with span('render', 'historical metrics'):
+            st.table(table)
         
         # Analyst expectations
         st.subheader('Analyst Expectations')
@@ -110,14 +156,37 @@ if ticker:
         
         # Stock chart
         st.subheader('Stock Price Chart')
-        st.line_chart(hist['Close'])
+        with span('fetch', 'history'):
+            hist = load_history(ticker)
+        with span('render', 'price chart'):
+            st.line_chart(hist['Close'])
 
         # User input for DCF assumptions
         st.subheader('DCF Assumptions')
         initial_fcf = st.number_input('Initial annual free cash flow (Billions $)', value=info.get('freeCashflow', 0) / 1000000000)
-        growth_rate = st.number_input('Annual growth rate (%)', value=5.0) / 100
+        # Growth defaults to the rate estimated from the statements, when there is one
+        with span('transform', 'growth estimates'):
+            growth = load_growth_estimates(ticker)
+        proposed_growth = float(growth['proposed_growth'])
+        if np.isfinite(proposed_growth):
+            growth_rate = st.number_input('Annual growth rate (%)', value=round(proposed_growth * 100, 2)) / 100
+            st.caption(f"Default from historical {growth['proposed_growth_source'].replace('_', ' ').replace('fcf', 'FCF')}, "
+                       "limited to -10%..25%")
+        else:
+            growth_rate = st.number_input('Annual growth rate (%)', value=5.0) / 100
         terminal_growth_rate = st.number_input('Terminal growth rate (%)', value=2.0) / 100
-        num_years = st.number_input('Number of years', value=5)
+        num_years = st.number_input('Number of years', min_value=1, value=5, step=1)
+        # The first period runs from the valuation date to the next fiscal year end
+        valuation_date = st.date_input('Valuation date', value=datetime.date.today())
+        last_fiscal_year_end = info.get('lastFiscalYearEnd')
+        if last_fiscal_year_end:
+            last_fiscal_year_end = datetime.datetime.fromtimestamp(last_fiscal_year_end, datetime.timezone.utc).date()
+        else:
+            last_fiscal_year_end = datetime.date(valuation_date.year, 12, 31)
+        fiscal_year_end = st.date_input('Fiscal year end (any year)', value=last_fiscal_year_end)
+        stub = stub_period(valuation_date, fiscal_year_end)
+        st.caption(f'First period: {stub:.2f} years to the next fiscal year end')
+        mid_year = st.checkbox('Mid-year convention (cash flows arrive mid-period)')
         tax_rate = st.number_input('Corporate tax rate (%)', value=21.0) / 100
         equity_value = st.number_input('Market value of equity (Billions $)', value=info.get('marketCap', 0) / 1000000000)
         debt_value = st.number_input('Market value of debt (Billions $)', value=info.get('totalDebt', 0) / 1000000000)
@@ -127,36 +196,99 @@ if ticker:
         debt_value = debt_value * 1000000000
         equity_value = equity_value * 1000000000
 
-        # Calculate WACC
-        wacc = calculate_wacc(equity_value, debt_value, cost_of_equity, cost_of_debt, tax_rate)
-        st.write(f'Weighted Average Cost of Capital (WACC): {wacc:.2%}')
+        # Projected annual FCF, one year past the horizon for the terminal value; the valuation and the
+        # annual chart use this array, quarterly and monthly charts are drawn from their own schedules
+        with span('transform', 'fcf schedule'):
+            annual_schedule = cash_flow_schedule(initial_fcf, growth_rate, num_years + 1, 'annual')
 
-        # Calculate DCF
-        total_value, discounted_fcf, terminal_value = calculate_dcf(initial_fcf, growth_rate, wacc, terminal_growth_rate, num_years)
-        
-        # Calculate quarterly FCF
-        quarterly_fcf = [initial_fcf / 4 * (1 + growth_rate / 4) ** i for i in range(num_years * 4)]
+        # Calculate WACC and DCF
+        with span('valuation', 'dcf'):
+            wacc = calculate_wacc(equity_value, debt_value, cost_of_equity, cost_of_debt, tax_rate)
+            # Each year is discounted from its fiscal year end date; the reverse DCF and Monte Carlo
+            # below use the evenly spaced fast path with the same stub
+            total_value, discounted_fcf, terminal_value, period_ends = calculate_dcf_dated(
+                initial_fcf, growth_rate, wacc, terminal_growth_rate, num_years, valuation_date, fiscal_year_end, mid_year,
+                cash_flows=annual_schedule)
+        st.write(f'Weighted Average Cost of Capital (WACC): {wacc:.2%}')
         
+        # Projected FCF per period, kept as one array and only scaled when displayed
+        frequency = st.selectbox('Cash flow chart frequency', list(PERIODS_PER_YEAR), index=1)
+        if frequency == 'annual':
+            fcf_schedule = annual_schedule[:num_years]
+        else:
+            with span('transform', 'fcf schedule'):
+                fcf_schedule = cash_flow_schedule(initial_fcf, growth_rate, num_years, frequency)
+
         st.write(f'Fair Value of the Company: Billion ${total_value / 1000000000:,.2f}')
         fair_value_per_share = total_value / info.get('sharesOutstanding', 1)
         st.write(f'**Fair Value per Share:** ${fair_value_per_share:.2f}')
-        myInt = 1000000000
-        discounted_fcf1 = [x / myInt for x in discounted_fcf]
-        discounted_fcf1 = [round(e, 2) for e in discounted_fcf1]
-        terminal_value1 = terminal_value / 1000000000
-        terminal_value1 = "{:.2f}".format(terminal_value1)
-        quarterly_fcf1 = [x / myInt for x in quarterly_fcf]
-        st.write('Discounted Free Cash Flows:', discounted_fcf1, " Billion $")
-        st.write('Terminal Value:', terminal_value1, " Billion $")
-
-        # Plot quarterly FCF
-        fig, ax = plt.subplots()
-        quarters = [f'Q{i + 1}' for i in range(len(quarterly_fcf))]
-        ax.plot(quarters, quarterly_fcf, marker='o')
-        ax.set_title('Quarterly Free Cash Flows')
-        ax.set_xlabel('Quarter')
-        ax.set_ylabel('Free Cash Flow ($)')
-        st.pyplot(fig)
+
+        # Reverse DCF: the growth rate and WACC that the current price implies
+        current_price = info.get('currentPrice')
+        if current_price:
+            shares_outstanding = info.get('sharesOutstanding', 1)
+            with span('valuation', 'reverse dcf'):
+                implied_growth = implied_growth_rate(current_price, shares_outstanding, initial_fcf, wacc, terminal_growth_rate, num_years,
+                                                     stub=stub, mid_year=mid_year)
+                implied_discount_rate = implied_wacc(current_price, shares_outstanding, initial_fcf, growth_rate, terminal_growth_rate, num_years,
+                                                     stub=stub, mid_year=mid_year)
+            st.write(f'**Implied Growth Rate at Current Price (${current_price:.2f}):** {implied_growth:.2%}')
+            st.write(f'**Implied WACC at Current Price (${current_price:.2f}):** {implied_discount_rate:.2%}')
+        st.write('Discounted Free Cash Flows (Billion $):',
+                 pd.Series(np.round(discounted_fcf / 1e9, 2), index=pd.Index(period_ends.astype(str), name='Fiscal year end')))
+        st.write('Terminal Value:', f'{terminal_value / 1e9:.2f}', " Billion $")
+
+        # Plot the FCF schedule
+        with span('render', 'fcf chart'):
+            st.image(fcf_schedule_chart(fcf_schedule, frequency))
+
+        # Monte Carlo simulation around the point estimates above
+        st.subheader('Monte Carlo Simulation')
+        if st.checkbox('Run Monte Carlo simulation'):
+            from functools import partial
+            from dcf_engine import FADES, calculate_dcf_value, calculate_multistage_value
+            from monte_carlo import run_monte_carlo
+            fade_years = st.number_input('Years to fade from the growth rate to terminal growth (0 = single stage)', min_value=0, value=0)
+            fade = st.selectbox('Fade shape', FADES)
+            if fade_years:
+                value_function = partial(calculate_multistage_value, fade_years=int(fade_years), fade=fade,
+                                         stub=stub, mid_year=mid_year)
+            else:
+                value_function = partial(calculate_dcf_value, stub=stub, mid_year=mid_year)
+            n_paths = st.number_input('Number of simulated paths', value=1000000, step=100000)
+            growth_std = st.number_input('Growth rate std dev (%)', value=2.0) / 100
+            cost_of_equity_std = st.number_input('Cost of equity std dev (%)', value=1.0) / 100
+            cost_of_debt_std = st.number_input('Cost of debt std dev (%)', value=0.5) / 100
+            terminal_growth_std = st.number_input('Terminal growth rate std dev (%)', value=0.5) / 100
+            rates_correlation = st.slider('Correlation of cost of equity and cost of debt', -1.0, 1.0, 0.5)
+            growth_correlation = st.slider('Correlation of growth and terminal growth', -1.0, 1.0, 0.3)
+            distributions = {
+                'growth_rate': {'dist': 'normal', 'mean': growth_rate, 'std': growth_std},
+                'cost_of_equity': {'dist': 'normal', 'mean': cost_of_equity, 'std': cost_of_equity_std},
+                'cost_of_debt': {'dist': 'normal', 'mean': cost_of_debt, 'std': cost_of_debt_std},
+                'terminal_growth_rate': {'dist': 'normal', 'mean': terminal_growth_rate, 'std': terminal_growth_std},
+            }
+            correlation = np.eye(4)
+            correlation[0, 3] = correlation[3, 0] = growth_correlation
+            correlation[1, 2] = correlation[2, 1] = rates_correlation
+            try:
+                with span('valuation', 'monte carlo'):
+                    simulation = run_monte_carlo(initial_fcf, num_years, equity_value, debt_value, tax_rate,
+                                                 info.get('sharesOutstanding', 1), distributions, correlation,
+                                                 n_paths=int(n_paths), value_function=value_function)
+            except ValueError as e:
+                st.error(f'Monte Carlo simulation failed: {e}')
+                simulation = None
+            if simulation is not None:
+                st.table(pd.DataFrame([(f'P{p}', f'${v:,.2f}') for p, v in simulation['percentiles'].items()],
+                                      columns=['Percentile', 'Fair Value per Share']))
+                st.write(f"Mean fair value per share: ${simulation['mean']:,.2f} "
+                         f"({simulation['n_valid']:,} of {simulation['n_paths']:,} paths had WACC above terminal growth)")
+                if simulation['n_valid']:
+                    with span('render', 'monte carlo histogram'):
+                        counts, edges = np.histogram(simulation['values'], bins=50,
+                                                     range=tuple(np.percentile(simulation['values'], [0.5, 99.5])))
+                        st.bar_chart(pd.Series(counts, index=np.round((edges[:-1] + edges[1:]) / 2, 2)))
         # Explanation section
         st.header('Explanation of the DCF Calculation')
         st.markdown("""
@@ -169,6 +301,7 @@ if ticker:
         **3. Discount FCF and Terminal Value:**
         - Use WACC to discount FCF and Terminal Value to present value.
         - Total Value = Sum of discounted FCFs + Discounted Terminal Value
+        - With a first period shorter than a year (a stub), it carries only that fraction of a year's FCF and later years are discounted to their actual dates. The mid-year convention discounts each period's FCF from its middle.
         """)
 
         st.header('Explanation of WACC Calculation')
@@ -197,4 +330,8 @@ if ticker:
         - **Number of Years**: Number of years to project FCF.
         """)
 
+run = finish_run()
+if run:
+    debug_panel(run)
+
 # End of the Streamlit app
@@ -0,0 +1,230 @@
+import argparse
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from data_cache import CachedTicker, DiskCache
+from dcf_engine import stub_period
+from fetch_scheduler import BATCH, FETCH_BURST, FETCH_RATE, FetchScheduler, scheduled, set_default_scheduler
+from price_store import PriceStore
+from providers import get_provider
+from screener import DEFAULT_ASSUMPTIONS, value_fundamentals
+
+# Statement line items the DCF inputs are rebuilt from: field -> (statement, labels tried in order)
+STATEMENT_FIELDS = {
+    'fcf': ('cashflow', ('Free Cash Flow',)),
+    'total_debt': ('balance_sheet', ('Total Debt',)),
+    'shares': ('balance_sheet', ('Ordinary Shares Number', 'Share Issued')),
+    'revenue': ('financials', ('Total Revenue',)),
+    'net_income': ('financials', ('Net Income',)),
+}
+
+# Days between a fiscal period's end and the date its statements are assumed public,
+# so a backtest never uses numbers before they were filed
+FILING_LAG_DAYS = 90
+
+# Forward return horizons in years
+DEFAULT_HORIZONS = (0.25, 1.0, 3.0)
+
+# Largest gap (days) between an evaluation date and the last price bar before it
+MAX_PRICE_STALENESS_DAYS = 10
+
+DAY_NS = 24 * 60 * 60 * 10 ** 9
+
+
+# Function to pick one line item from a statement (line items as rows, report dates as columns)
+# Returns report dates as int64 nanoseconds and the values, oldest first.
+def _statement_row(statement, labels):
+    for label in labels:
+        if statement is not None and label in statement.index:
+            row = pd.to_numeric(statement.loc[label], errors='coerce').dropna()
+            row = row.sort_index()
+            return pd.DatetimeIndex(row.index).as_unit('ns').asi8, row.to_numpy(dtype=np.float64)
+    return np.empty(0, dtype=np.int64), np.empty(0)
+
+
+# Function to lay out a ticker's annual statements as columns aligned on report date
+# Returns (report dates as int64 ns, {field: float64 array}), NaN where a statement lacks the item.
+def load_fundamentals(stock):
+    statements = {}
+    rows = {}
+    for field, (statement, labels) in STATEMENT_FIELDS.items():
+        if statement not in statements:
+            try:
+                statements[statement] = getattr(stock, statement)
+            except (NotImplementedError, LookupError):
+                statements[statement] = None
+        rows[field] = _statement_row(statements[statement], labels)
+    report_dates = np.unique(np.concatenate([dates for dates, _ in rows.values()]))
+    columns = {}
+    for field, (dates, values) in rows.items():
+        column = np.full(report_dates.size, np.nan)
+        column[np.searchsorted(report_dates, dates)] = values
+        columns[field] = column
+    return report_dates, columns
+
+
+# Function to list quarter-end evaluation dates between start and end as int64 nanoseconds
+def quarter_ends(start, end):
+    return pd.date_range(start, end, freq='QE').as_unit('ns').asi8
+
+
+# Function to look up the last price on or before each date; NaN where there is none or it is stale
+def _price_at(dates, prices, when, max_staleness=MAX_PRICE_STALENESS_DAYS * DAY_NS):
+    if not dates.size:
+        return np.full(when.shape, np.nan)
+    index = np.searchsorted(dates, when, side='right') - 1
+    fresh = (index >= 0) & (when - dates[np.clip(index, 0, None)] <= max_staleness)
+    return np.where(fresh, prices[np.clip(index, 0, None)], np.nan)
+
+
+# Function to build one ticker's backtest rows: at each quarter end, the latest statements already
+# filed, the price that day and the prices at each forward horizon, all as column arrays
+def ticker_panel(ticker, provider=None, start=None, end=None, horizons=DEFAULT_HORIZONS,
+                 filing_lag_days=FILING_LAG_DAYS, cache_dir=None, price_store_dir=None):
+    provider = get_provider(provider) if provider is None or isinstance(provider, str) else provider
+    provider = scheduled(provider, BATCH)
+    stock = CachedTicker(ticker, DiskCache(cache_dir) if cache_dir else None, provider)
+    report_dates, fundamentals = load_fundamentals(stock)
+
+    store = PriceStore(price_store_dir, provider) if price_store_dir else PriceStore(provider=provider)
+    records, _ = store.refresh(ticker, 'max')
+    price_dates = np.asarray(records['date'])
+    closes = np.asarray(records['Close'])
+    if not report_dates.size or not price_dates.size:
+        return None
+
+    available = report_dates + filing_lag_days * DAY_NS
+    first = max(available[0], price_dates[0])
+    last = price_dates[-1] if end is None else min(price_dates[-1], pd.Timestamp(end).value)
+    if start is not None:
+        first = max(first, pd.Timestamp(start).value)
+    dates = quarter_ends(pd.Timestamp(first), pd.Timestamp(last))
+    report = np.searchsorted(available, dates, side='right') - 1
+    dates, report = dates[report >= 0], report[report >= 0]
+
+    panel = {'date': dates, 'report_date': report_dates[report], 'price': _price_at(price_dates, closes, dates)}
+    panel.update({field: column[report] for field, column in fundamentals.items()})
+    for horizon in horizons:
+        forward_dates = dates + int(round(horizon * 365.25)) * DAY_NS
+        panel[f'forward_return_{horizon:g}y'] = _price_at(price_dates, closes, forward_dates) / panel['price'] - 1
+    panel['ticker'] = np.full(dates.size, ticker.upper(), dtype=object)
+    return panel
+
+
+# Function to run ticker_panel in a worker process; failures become an error message instead of a crash
+def _panel_worker(args):
+    ticker, kwargs = args
+    try:
+        return ticker, ticker_panel(ticker, **kwargs), None
+    except Exception as e:
+        return ticker, None, f'{type(e).__name__}: {e}'
+
+
+# Function to set up a backtest worker process: every worker has its own scheduler, so each gets an
+# equal share of the upstream budget and together they fetch no faster than one process would
+def _init_worker(processes):
+    set_default_scheduler(FetchScheduler(FETCH_RATE / processes, max(1, FETCH_BURST // processes)))
+
+
+# Function to backtest DCF fair values against later returns for many tickers
+# Statements and prices are loaded in worker processes (through the on-disk cache and the columnar
+# price store, so reruns read local files only); the valuation runs once over all rows with the
+# batched kernels. provider is a spec string such as 'local:/path' or a picklable provider.
+# Returns one row per ticker and quarter, plus the tickers that could not be loaded.
+def run_backtest(tickers, assumptions=None, provider=None, start=None, end=None, horizons=DEFAULT_HORIZONS,
+                 filing_lag_days=FILING_LAG_DAYS, processes=None, cache_dir=None, price_store_dir=None):
+    kwargs = {'provider': provider, 'start': start, 'end': end, 'horizons': horizons,
+              'filing_lag_days': filing_lag_days, 'cache_dir': cache_dir, 'price_store_dir': price_store_dir}
+    jobs = [(t.strip().upper(), kwargs) for t in dict.fromkeys(tickers) if t.strip()]
+    if processes == 1:
+        outcomes = list(map(_panel_worker, jobs))
+    else:
+        processes = processes or os.cpu_count() or 1
+        with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker, initargs=(processes,)) as executor:
+            outcomes = list(executor.map(_panel_worker, jobs, chunksize=max(1, len(jobs) // (4 * processes))))
+
+    panels = [panel for _, panel, _ in outcomes if panel is not None and panel['date'].size]
+    errors = {ticker: error for ticker, _, error in outcomes if error}
+    if not panels:
+        return pd.DataFrame(), errors
+    columns = {name: np.concatenate([panel[name] for panel in panels]) for name in panels[0]}
+
+    # Rebuild the screener's inputs as they stood on each date, then value every row at once
+    market_cap = columns['price'] * columns['shares']
+    with np.errstate(divide='ignore', invalid='ignore'):
+        pe_ratio = np.where(columns['net_income'] != 0, market_cap / columns['net_income'], np.nan)
+    fundamentals = {
+        'currentPrice': columns['price'], 'sharesOutstanding': columns['shares'], 'marketCap': market_cap,
+        'totalDebt': columns['total_debt'], 'freeCashflow': columns['fcf'], 'totalRevenue': columns['revenue'],
+        'trailingPE': pe_ratio,
+    }
+    # Each row is valued on its evaluation date; annual reports are dated at the fiscal year end
+    stub = stub_period(columns['date'].astype('datetime64[ns]'), columns['report_date'].astype('datetime64[ns]'))
+    valued = value_fundamentals(fundamentals, columns['price'].size, assumptions, stub=stub)
+
+    results = pd.DataFrame({
+        'ticker': columns['ticker'],
+        'date': pd.to_datetime(columns['date']),
+        'report_date': pd.to_datetime(columns['report_date']),
+        'method': valued['method'],
+        'price': columns['price'],
+        'fair_value_per_share': valued['fair_value_per_share'],
+        'upside': valued['upside'],
+        **{name: values for name, values in columns.items() if name.startswith('forward_return_')},
+    })
+    return results, errors
+
+
+# Function to score how well upside predicted forward returns at each horizon
+# Rank correlation (Spearman), hit rate (upside and return with the same sign), and the mean
+# forward return of the top and bottom upside quintiles of each date.
+def summarize(results):
+    rows = []
+    for column in [c for c in results.columns if c.startswith('forward_return_')]:
+        scored = results[['date', 'upside', column]].replace([np.inf, -np.inf], np.nan).dropna()
+        if scored.empty:
+            rows.append({'horizon': column[len('forward_return_'):], 'observations': 0})
+            continue
+        quintile = scored.groupby('date')['upside'].rank(pct=True)
+        rows.append({
+            'horizon': column[len('forward_return_'):],
+            'observations': len(scored),
+            'rank_correlation': scored['upside'].rank().corr(scored[column].rank()),
+            'hit_rate': float((np.sign(scored['upside']) == np.sign(scored[column])).mean()),
+            'top_quintile_return': scored.loc[quintile > 0.8, column].mean(),
+            'bottom_quintile_return': scored.loc[quintile <= 0.2, column].mean(),
+        })
+    return pd.DataFrame(rows)
+
+
+def main(argv=None):
+    from valuation_cli import read_tickers, write_results
+    parser = argparse.ArgumentParser(description='Backtest DCF fair values against later returns.')
+    parser.add_argument('tickers', help="file with tickers, or '-' for stdin")
+    parser.add_argument('-o', '--output', default='-', help="per-quarter results as .csv or .parquet (default: CSV to stdout)")
+    parser.add_argument('--provider', help="market data provider, e.g. 'yfinance' or 'local:/path/to/snapshots'")
+    parser.add_argument('--start', help='first evaluation date')
+    parser.add_argument('--end', help='last evaluation date')
+    parser.add_argument('--processes', type=int, help='worker processes (default: one per CPU)')
+    parser.add_argument('--filing-lag', type=int, default=FILING_LAG_DAYS, help='days before statements count as public')
+    for name, default in DEFAULT_ASSUMPTIONS.items():
+        parser.add_argument('--' + name.replace('_', '-'), type=type(default), default=default, help=f'default: {default}')
+    args = parser.parse_args(argv)
+
+    assumptions = {name: getattr(args, name) for name in DEFAULT_ASSUMPTIONS}
+    results, errors = run_backtest(read_tickers(args.tickers), assumptions, provider=args.provider,
+                                   start=args.start, end=args.end, filing_lag_days=args.filing_lag,
+                                   processes=args.processes)
+    write_results(results, args.output)
+    print(summarize(results).to_string(index=False), file=sys.stderr)
+    for ticker, error in errors.items():
+        print(f'{ticker}: {error}', file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,114 @@
+import random
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from providers import MarketDataProvider, RateLimitError, save_snapshot
+
+# Tickers written by write_fixtures, with (price, FCF, revenue, shares, trailing PE)
+FIXTURE_TICKERS = {
+    'AAPL': (190.0, 1.0e11, 3.8e11, 1.55e10, 29.5),
+    'MSFT': (420.0, 7.0e10, 2.3e11, 7.4e09, 36.0),
+    'LOSS': (12.0, -4.0e08, 2.0e09, 3.0e08, None),
+}
+
+
+# Deterministic market data for benchmarks: same numbers on every run, no network
+class SyntheticProvider(MarketDataProvider):
+    def info(self, ticker):
+        price, fcf, revenue, shares, pe_ratio = FIXTURE_TICKERS[ticker]
+        return {
+            'shortName': f'{ticker} Synthetic', 'currentPrice': price, 'previousClose': price * 0.99,
+            'marketCap': price * shares, 'trailingPE': pe_ratio, 'forwardPE': pe_ratio, 'pegRatio': 2.0,
+            'priceToSalesTrailing12Months': price * shares / revenue, 'priceToBook': 10.0, 'dividendYield': 0.01,
+            'freeCashflow': fcf, 'totalRevenue': revenue, 'sharesOutstanding': shares, 'totalDebt': 0.04 * price * shares,
+            'profitMargins': 0.2, 'targetMeanPrice': price * 1.1, 'recommendationKey': 'buy',
+            'lastFiscalYearEnd': int(self._report_dates()[0].timestamp()),
+        }
+
+    def history(self, ticker, period='5y'):
+        dates = pd.bdate_range('2019-07-01', '2024-06-28')
+        rng = np.random.default_rng(sum(map(ord, ticker)))
+        close = FIXTURE_TICKERS[ticker][0] * np.exp(np.cumsum(rng.normal(0.0003, 0.015, len(dates))))
+        return pd.DataFrame({'Open': close, 'High': close * 1.01, 'Low': close * 0.99, 'Close': close,
+                             'Volume': 1e7}, index=dates)
+
+    def financials(self, ticker):
+        revenue = FIXTURE_TICKERS[ticker][2]
+        return pd.DataFrame([[revenue * 0.92 ** i for i in range(4)], [revenue * 0.2 * 0.9 ** i for i in range(4)]],
+                            index=['Total Revenue', 'Net Income'], columns=self._report_dates())
+
+    def cashflow(self, ticker):
+        fcf = FIXTURE_TICKERS[ticker][1]
+        return pd.DataFrame([[fcf * 0.93 ** i for i in range(4)]], index=['Free Cash Flow'], columns=self._report_dates())
+
+    def balance_sheet(self, ticker):
+        price, _, _, shares, _ = FIXTURE_TICKERS[ticker]
+        return pd.DataFrame([[0.04 * price * shares] * 4, [shares * 1.01 ** i for i in range(4)]],
+                            index=['Total Debt', 'Ordinary Shares Number'], columns=self._report_dates())
+
+    @staticmethod
+    def _report_dates():
+        return [pd.Timestamp(f'{year}-09-30') for year in (2023, 2022, 2021, 2020)]
+
+
+# Synthetic provider that behaves like a throttled upstream, for exercising the fetch scheduler:
+# every call sleeps `latency` seconds, fails with RateLimitError (a 429) with probability
+# `throttle_probability`, and always fails when more than `max_rate` calls started in the last second.
+# Counts calls and 429s per method, and the order in which tickers were served.
+class FlakyProvider(SyntheticProvider):
+    def __init__(self, latency=0.05, throttle_probability=0.0, max_rate=None, seed=0):
+        self.latency = latency
+        self.throttle_probability = throttle_probability
+        self.max_rate = max_rate
+        self.calls = {}
+        self.throttled = 0
+        self.served = []
+        self._recent = []
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _request(self, name, ticker):
+        with self._lock:
+            now = time.monotonic()
+            self.calls[name] = self.calls.get(name, 0) + 1
+            self._recent = [t for t in self._recent if now - t < 1.0] + [now]
+            throttled = (self.max_rate is not None and len(self._recent) > self.max_rate
+                         or self._rng.random() < self.throttle_probability)
+            if throttled:
+                self.throttled += 1
+            else:
+                self.served.append(ticker)
+        time.sleep(self.latency)
+        if throttled:
+            raise RateLimitError(f'429 Too Many Requests: {name} {ticker}')
+
+    def info(self, ticker):
+        self._request('info', ticker)
+        return super().info(ticker)
+
+    def history(self, ticker, period='5y'):
+        self._request('history', ticker)
+        return super().history(ticker, period)
+
+    def financials(self, ticker):
+        self._request('financials', ticker)
+        return super().financials(ticker)
+
+    def cashflow(self, ticker):
+        self._request('cashflow', ticker)
+        return super().cashflow(ticker)
+
+    def balance_sheet(self, ticker):
+        self._request('balance_sheet', ticker)
+        return super().balance_sheet(ticker)
+
+
+# Function to write the synthetic tickers as local provider snapshots under root
+def write_fixtures(root):
+    provider = SyntheticProvider()
+    for ticker in FIXTURE_TICKERS:
+        save_snapshot(provider, ticker, root)
+    return root
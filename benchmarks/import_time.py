@@ -0,0 +1,68 @@
+import ast
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Heavy dependencies that pages should only import on the code path that needs them
+LAZY_MODULES = ('yfinance', 'matplotlib.figure', 'seaborn', 'scipy.special')
+
+
+# Function to collect a script's module-level import statements (those that run on every cold start)
+def page_imports(script):
+    with open(os.path.join(ROOT, script)) as f:
+        tree = ast.parse(f.read())
+    return [ast.unparse(node) for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom))]
+
+
+# Function to run statements in a fresh interpreter under -X importtime and parse its report
+# Returns the total import time and per-module (self, cumulative) times in seconds.
+def import_time(statements):
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', '\n'.join(statements)],
+                            cwd=ROOT, capture_output=True, text=True, check=True)
+    modules = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        # One space follows the separator; any further indentation marks a nested import
+        modules.append((name[1:].rstrip(), int(self_us) / 1e6, int(cumulative_us) / 1e6))
+    # Top-level imports are the lines without indentation; their cumulative times add up to the total
+    total = sum(cumulative for name, _, cumulative in modules if not name.startswith(' '))
+    return {'total_s': total, 'modules': modules}
+
+
+# Function to summarize import time over several cold interpreters, with the slowest top-level modules
+# Interpreter startup imports (encodings, site, ...) are measured separately and subtracted.
+def import_report(statements, repeat=3, top=10):
+    startup = statistics.median(import_time(['pass'])['total_s'] for _ in range(repeat))
+    runs = [import_time(statements) for _ in range(repeat)]
+    totals = [run['total_s'] - startup for run in runs]
+    slowest = sorted((m for m in runs[-1]['modules'] if not m[0].startswith(' ')), key=lambda m: -m[2])[:top]
+    return {
+        'median_s': statistics.median(totals),
+        'min_s': min(totals),
+        'repeat': repeat,
+        'statements': statements,
+        'slowest': [{'module': name.strip(), 'self_s': self_s, 'cumulative_s': cumulative_s}
+                    for name, self_s, cumulative_s in slowest],
+    }
+
+
+# Function to report cold-start import time of each page and of the modules they load lazily
+def bench_imports(scripts=('DCF1.py', 'DCF2.py', 'pages/1_Screener.py'), repeat=3):
+    results = {}
+    for script in scripts:
+        results[f'import.{script}'] = import_report(page_imports(script), repeat)
+    for module in LAZY_MODULES:
+        results[f'import.lazy.{module}'] = import_report([f'import {module}'], repeat)
+    return results
+
+
+if __name__ == '__main__':
+    for name, report in bench_imports().items():
+        print(f"{name:40s} {report['median_s'] * 1e3:10.1f} ms")
+        for module in report['slowest'][:5]:
+            print(f"    {module['module']:36s} {module['cumulative_s'] * 1e3:10.1f} ms")
@@ -0,0 +1,347 @@
+import argparse
+import gc
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Pages read their provider and cache settings from the environment, so point them at
+# local fixtures before anything imports providers or data_cache
+FIXTURE_DIR = tempfile.mkdtemp(prefix='dcf-bench-fixtures-')
+os.environ['DCF_PROVIDER'] = 'local:' + FIXTURE_DIR
+os.environ['DCF_CACHE_DIR'] = tempfile.mkdtemp(prefix='dcf-bench-cache-')
+os.environ['DCF_PRICE_STORE_DIR'] = tempfile.mkdtemp(prefix='dcf-bench-prices-')
+
+import numpy as np
+
+from benchmarks.fixtures import write_fixtures
+from benchmarks.import_time import bench_imports
+from benchmarks.scheduler import bench_scheduler
+from dcf_engine import (calculate_dcf_batch, calculate_dcf_dated, calculate_dcf_value, calculate_fair_value_batch,
+                        calculate_fair_value_grid, calculate_multistage_value, cash_flow_times, present_value, xnpv)
+from sensitivity import plot_sensitivity_heatmap, sensitivity_grid, sensitivity_heatmap_png, sensitivity_table
+from valuation import calculate_dcf, calculate_fair_value, calculate_ps_valuation, calculate_wacc
+
+BATCH_SIZES = (1_000, 100_000, 1_000_000)
+
+# Sensitivity heatmap grid sides: the annotated default, the largest annotated grid and the slider's largest grid
+HEATMAP_SIZES = (9, 12, 200)
+
+# Speedup calculate_dcf_batch must reach over the original scalar loop on SPEEDUP_SCENARIOS
+# mixed-horizon scenarios; results below it are reported with meets_target False
+SPEEDUP_SCENARIOS = 1_000_000
+SPEEDUP_TARGET = 100
+
+# Relative slowdown (or peak memory growth) beyond which --compare reports a regression
+DEFAULT_THRESHOLD = 0.20
+
+
+# Function to time fn over several repeats and measure its peak Python memory in one extra run
+def measure(fn, repeat=5, number=1):
+    fn()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        times.append((time.perf_counter() - start) / number)
+    tracemalloc.start()
+    fn()
+    _, peak_bytes = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {'median_s': statistics.median(times), 'min_s': min(times), 'repeat': repeat,
+            'number': number, 'peak_bytes': peak_bytes}
+
+
+# Function to build random but seeded DCF scenarios
+def scenarios(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return {
+        'fcf': rng.uniform(1e8, 1e11, n),
+        'growth_rate': rng.uniform(-0.05, 0.25, n),
+        'wacc': rng.uniform(0.06, 0.14, n),
+        'terminal_growth_rate': rng.uniform(0.0, 0.04, n),
+        'num_years': rng.integers(3, 11, n),
+        'equity_value': rng.uniform(1e9, 3e12, n),
+        'debt_value': rng.uniform(0, 5e11, n),
+        'sales': rng.uniform(1e8, 4e11, n),
+    }
+
+
+def bench_scalar_kernels():
+    return {
+        'scalar.calculate_fair_value': measure(lambda: calculate_fair_value(100.0, 0.1, 0.09, 0.03), number=10_000),
+        'scalar.calculate_dcf': measure(lambda: calculate_dcf(1e11, 0.05, 0.08, 0.02, 5), number=10_000),
+        'scalar.calculate_dcf_total_only': measure(lambda: calculate_dcf(1e11, 0.05, 0.08, 0.02, 5, per_year=False), number=10_000),
+        'scalar.calculate_wacc': measure(lambda: calculate_wacc(3e12, 1e11, 0.08, 0.05, 0.21), number=10_000),
+        'scalar.calculate_ps_valuation': measure(lambda: calculate_ps_valuation(3.8e11, 1.5), number=10_000),
+    }
+
+
+def bench_batched_kernels(sizes=BATCH_SIZES):
+    results = {}
+    for n in sizes:
+        s = scenarios(n)
+        results[f'batch.calculate_fair_value[{n}]'] = measure(
+            lambda: calculate_fair_value_batch(s['fcf'], s['growth_rate'], s['wacc'], s['terminal_growth_rate'], s['num_years']))
+        results[f'batch.calculate_dcf_value[{n}]'] = measure(
+            lambda: calculate_dcf_value(s['fcf'], s['growth_rate'], s['wacc'], s['terminal_growth_rate'], s['num_years']))
+        results[f'batch.calculate_dcf_per_year[{n}]'] = measure(
+            lambda: calculate_dcf_batch(s['fcf'], s['growth_rate'], s['wacc'], s['terminal_growth_rate'], s['num_years']))
+        # Dated cash flows: one valuation date per scenario, against the evenly spaced closed form and XNPV
+        valuation_dates = np.datetime64('2024-01-01') + (np.arange(n) % 366)
+        stub = (np.datetime64('2024-12-31') - valuation_dates).astype(np.float64) / 365
+        results[f'batch.calculate_dcf_dated[{n}]'] = measure(
+            lambda: calculate_dcf_dated(s['fcf'], s['growth_rate'], s['wacc'], s['terminal_growth_rate'], 5,
+                                        valuation_dates, '2023-12-31'))
+        results[f'batch.calculate_dcf_value_stub[{n}]'] = measure(
+            lambda: calculate_dcf_value(s['fcf'], s['growth_rate'], s['wacc'], s['terminal_growth_rate'], 5, stub=np.maximum(stub, 1 / 365)))
+        times, year_fraction = cash_flow_times(5, np.maximum(stub, 1 / 365))
+        even_cash_flows = np.outer(s['fcf'], np.arange(1, 6) ** 0.5) * year_fraction
+        results[f'batch.xnpv_even_periods[{n}]'] = measure(lambda: xnpv(even_cash_flows, times, s['wacc']))
+        results[f'batch.calculate_multistage_value[{n}]'] = measure(
+            lambda: calculate_multistage_value(s['fcf'], s['growth_rate'], s['wacc'], s['terminal_growth_rate'], 5, fade_years=5))
+        cash_flows = np.outer(s['fcf'], np.arange(1, 11) ** 0.5)
+        grid_rates = np.round(s['wacc'], 4)
+        results[f'batch.present_value_shared_rate[{n}]'] = measure(lambda: present_value(cash_flows, 0.09))
+        results[f'batch.present_value_grid_rates[{n}]'] = measure(lambda: present_value(cash_flows, grid_rates))
+        results[f'batch.present_value_exact_rates[{n}]'] = measure(lambda: present_value(cash_flows, s['wacc']))
+        results[f'batch.calculate_wacc[{n}]'] = measure(
+            lambda: calculate_wacc(s['equity_value'], s['debt_value'], s['wacc'], s['growth_rate'], 0.21))
+        results[f'batch.calculate_ps_valuation[{n}]'] = measure(lambda: calculate_ps_valuation(s['sales'], 1.5))
+    return results
+
+
+# Function to time a sensitivity sweep over rates typed in percent (all on the discount-factor table's
+# grid): the table-backed grid kernel against the per-cell closed form it replaces
+def bench_sensitivity_sweep(growth_points=50, rate_points=201):
+    growth_rates = np.linspace(0.0, 0.2, growth_points)
+    discount_rates = np.linspace(600, 1200, rate_points) / 10000
+    terminal_growth_rates = np.linspace(0, 400, rate_points) / 10000
+    cells = growth_points * rate_points * rate_points
+    return {
+        f'sweep.calculate_fair_value_grid[{cells}]': measure(
+            lambda: sensitivity_grid(100.0, growth_rates, discount_rates, terminal_growth_rates)),
+        f'sweep.calculate_fair_value_batch[{cells}]': measure(
+            lambda: sensitivity_grid(100.0, growth_rates, discount_rates, terminal_growth_rates,
+                                     value_function=calculate_fair_value_batch)),
+    }
+
+
+# Function to time drawing the sensitivity heatmap and encoding it to PNG, as DCF1.py does
+def bench_heatmaps(sizes=HEATMAP_SIZES):
+    results = {}
+    for n in sizes:
+        table = sensitivity_table(100.0, 0.1, np.linspace(0.06, 0.12, n), np.linspace(0.01, 0.04, n))
+        results[f'render.plot_sensitivity_heatmap[{n}]'] = measure(lambda: plot_sensitivity_heatmap(table))
+        results[f'render.sensitivity_heatmap_png[{n}]'] = measure(lambda: sensitivity_heatmap_png(table))
+    return results
+
+
+# Function to value DCF scenarios one at a time, as DCF2.py's calculate_dcf did before the batch kernels
+def _scalar_loop_dcf(fcf, growth_rate, wacc, terminal_growth_rate, num_years):
+    discounted_fcf = []
+    for i in range(num_years):
+        discounted_fcf.append(fcf / ((1 + wacc) ** (i + 1)))
+        fcf = fcf * (1 + growth_rate)
+    terminal_value = (fcf * (1 + terminal_growth_rate)) / (wacc - terminal_growth_rate)
+    discounted_terminal_value = terminal_value / ((1 + wacc) ** num_years)
+    total_value = sum(discounted_fcf) + discounted_terminal_value
+    return total_value, discounted_fcf, terminal_value
+
+
+# Function to compare calculate_dcf_batch with the scalar loop it replaced on the same scenarios
+def bench_dcf_speedup(n=SPEEDUP_SCENARIOS):
+    s = scenarios(n)
+    inputs = [s[key].tolist() for key in ('fcf', 'growth_rate', 'wacc', 'terminal_growth_rate', 'num_years')]
+    start = time.perf_counter()
+    loop_values = [_scalar_loop_dcf(*args)[0] for args in zip(*inputs)]
+    loop_s = time.perf_counter() - start
+    batch = measure(lambda: calculate_dcf_batch(s['fcf'], s['growth_rate'], s['wacc'], s['terminal_growth_rate'], s['num_years']))
+    total_value, _, _ = calculate_dcf_batch(s['fcf'], s['growth_rate'], s['wacc'], s['terminal_growth_rate'], s['num_years'])
+    if not np.allclose(total_value, loop_values, rtol=1e-12, atol=0):
+        raise RuntimeError('calculate_dcf_batch disagrees with the scalar loop')
+    speedup = loop_s / batch['median_s']
+    return {f'speedup.calculate_dcf_batch[{n}]': {'elapsed_s': batch['median_s'], 'loop_s': round(loop_s, 4),
+                                                  'speedup': round(speedup, 1), 'target': SPEEDUP_TARGET,
+                                                  'meets_target': speedup >= SPEEDUP_TARGET}}
+
+
+# Function to run a page headlessly with AppTest: first render, then a rerun after an input change
+def bench_page(script, ticker, interact, repeat=5):
+    from streamlit.testing.v1 import AppTest
+    path = os.path.join(ROOT, script)
+
+    def first_render():
+        at = AppTest.from_file(path, default_timeout=120)
+        at.run()
+        at.text_input[0].set_value(ticker).run()
+        if at.exception:
+            raise RuntimeError(f'{script} raised: {at.exception[0].value}')
+        return at
+
+    at = first_render()
+
+    def rerun():
+        interact(at)
+        at.run()
+
+    return {
+        f'page.{script}[{ticker}].first_render': measure(first_render, repeat=repeat),
+        f'page.{script}[{ticker}].rerun': measure(rerun, repeat=repeat),
+    }
+
+
+# Functions to change one input between reruns, as an analyst would
+def _bump_discount_slider(at):
+    slider = [s for s in at.slider if s.label.startswith('Discount Rate')][0]
+    slider.set_value(8 if slider.value == 9 else 9)
+    at.button[0].click()
+
+
+def _bump_cost_of_debt(at):
+    number_input = [n for n in at.number_input if n.label.startswith('Cost of debt')][0]
+    number_input.set_value(5.5 if number_input.value == 5.0 else 5.0)
+
+
+# Function to rerun a page many times and report the memory it keeps between reruns
+# Retained bytes are Python allocations still alive after the last rerun compared with after warm-up
+# (cyclic garbage, such as each run's module namespace, is collected first);
+# open figures counts matplotlib figures left in pyplot's registry. Both should stay flat.
+def bench_rerun_memory(script, ticker, interact, reruns=100, warmup=10):
+    from streamlit.testing.v1 import AppTest
+    at = AppTest.from_file(os.path.join(ROOT, script), default_timeout=120)
+    at.run()
+    at.text_input[0].set_value(ticker).run()
+    for _ in range(warmup):
+        interact(at)
+        at.run()
+    gc.collect()
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    start = time.perf_counter()
+    for _ in range(reruns):
+        interact(at)
+        at.run()
+    elapsed = time.perf_counter() - start
+    gc.collect()
+    retained = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+    if at.exception:
+        raise RuntimeError(f'{script} raised: {at.exception[0].value}')
+    pyplot = sys.modules.get('matplotlib.pyplot')
+    return {f'memory.{script}[{ticker}].reruns': {
+        'median_s': elapsed / reruns, 'reruns': reruns, 'retained_bytes': retained,
+        'open_figures': len(pyplot.get_fignums()) if pyplot else 0}}
+
+
+def _bump_heatmap_grid(at):
+    if not at.checkbox[0].value:
+        at.checkbox[0].check()
+        return
+    slider = [s for s in at.slider if s.label.startswith('Grid points')][0]
+    slider.set_value(10 if slider.value == 9 else 9)
+
+
+def bench_pages(repeat=5, memory_reruns=100):
+    write_fixtures(FIXTURE_DIR)
+    results = {}
+    results.update(bench_page('DCF1.py', 'AAPL', _bump_discount_slider, repeat))
+    results.update(bench_page('DCF2.py', 'AAPL', _bump_cost_of_debt, repeat))
+    results.update(bench_page('DCF2.py', 'LOSS', lambda at: at.number_input[0].set_value(at.number_input[0].value + 0.1), repeat))
+    if memory_reruns:
+        results.update(bench_rerun_memory('DCF1.py', 'AAPL', _bump_heatmap_grid, memory_reruns))
+        results.update(bench_rerun_memory('DCF2.py', 'AAPL', _bump_cost_of_debt, memory_reruns))
+    return results
+
+
+def environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT, capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = None
+    return {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+    }
+
+
+# Function to list benchmarks that got slower or used more peak memory than the baseline allows
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD):
+    regressions = []
+    for name, current in results['results'].items():
+        previous = baseline['results'].get(name)
+        if previous is None:
+            continue
+        for metric in ('median_s', 'peak_bytes', 'retained_bytes'):
+            if metric not in previous or metric not in current:
+                continue
+            if previous[metric] and current[metric] > previous[metric] * (1 + threshold):
+                regressions.append(f'{name} {metric}: {previous[metric]:.6g} -> {current[metric]:.6g} '
+                                   f'(+{current[metric] / previous[metric] - 1:.0%})')
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the DCF kernels and the Streamlit pages.')
+    parser.add_argument('-o', '--output', default=os.path.join(ROOT, 'benchmarks', 'results.json'),
+                        help='where to write the JSON results')
+    parser.add_argument('--compare', help='baseline results JSON; exit with status 1 on regressions')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD, help='allowed relative regression')
+    parser.add_argument('--skip-pages', action='store_true', help='only run the kernel benchmarks')
+    parser.add_argument('--skip-scheduler', action='store_true', help='skip the fetch scheduler checks against a throttling fake provider')
+    parser.add_argument('--skip-imports', action='store_true', help='skip the cold-start import time report')
+    parser.add_argument('--repeat', type=int, default=5, help='repeats per page benchmark')
+    parser.add_argument('--memory-reruns', type=int, default=100, help='reruns per page memory benchmark (0 to skip)')
+    args = parser.parse_args(argv)
+
+    results = {}
+    results.update(bench_scalar_kernels())
+    results.update(bench_batched_kernels())
+    results.update(bench_dcf_speedup())
+    results.update(bench_sensitivity_sweep())
+    results.update(bench_heatmaps())
+    if not args.skip_pages:
+        results.update(bench_pages(args.repeat, args.memory_reruns))
+    if not args.skip_scheduler:
+        results.update(bench_scheduler())
+    if not args.skip_imports:
+        results.update(bench_imports())
+    report = {'environment': environment(), 'results': results}
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    for name, result in results.items():
+        peak = f"{result['peak_bytes'] / 1e6:10.2f} MB" if 'peak_bytes' in result else ''
+        if 'retained_bytes' in result:
+            peak = f"{result['retained_bytes'] / 1e6:10.2f} MB retained, {result['open_figures']} open figures"
+        if 'elapsed_s' in result:
+            peak = ', '.join(f'{key}={value}' for key, value in result.items() if key != 'elapsed_s')
+        print(f"{name:60s} {result.get('median_s', result.get('elapsed_s')) * 1e3:12.4f} ms  {peak}")
+    for name, result in results.items():
+        if result.get('meets_target') is False:
+            print('BELOW TARGET', f"{name}: {result['speedup']}x < {result['target']}x")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(report, json.load(f), args.threshold)
+        for line in regressions:
+            print('REGRESSION', line)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,97 @@
+import os
+import sys
+import threading
+import time
+from functools import partial
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.fixtures import FlakyProvider
+from fetch_scheduler import BATCH, INTERACTIVE, FetchScheduler, scheduled
+
+
+# Function to fail a scheduler benchmark whose expectation does not hold
+def _check(condition, message):
+    if not condition:
+        raise RuntimeError(f'fetch scheduler: {message}')
+
+
+# Function to send many identical requests at once; they must share a single upstream call
+def bench_deduplication(requests=20):
+    provider = FlakyProvider(latency=0.2)
+    scheduler = FetchScheduler(rate=0, workers=4)
+    client = scheduled(provider, INTERACTIVE, scheduler)
+    results = [None] * requests
+
+    def fetch(i):
+        results[i] = client.info('MSFT')
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=fetch, args=(i,)) for i in range(requests)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    scheduler.shutdown()
+    _check(provider.calls == {'info': 1}, f'{requests} identical requests made {provider.calls} upstream calls')
+    _check(all(result == results[0] for result in results), 'deduplicated requests got different results')
+    return {'elapsed_s': elapsed, 'requests': requests, 'upstream_calls': provider.calls['info'],
+            'deduplicated': scheduler.stats()['deduplicated']}
+
+
+# Function to queue a batch backlog, then make an interactive request; it must overtake the backlog
+def bench_preemption(backlog=30, workers=2):
+    provider = FlakyProvider(latency=0.02)
+    scheduler = FetchScheduler(rate=20, burst=1, workers=workers, retries=0)
+    batch = [scheduler.submit(('history', n), partial(provider.history, 'AAPL', f'{n + 1}d'), BATCH)
+             for n in range(backlog)]
+    while len(provider.served) < 3:
+        time.sleep(0.005)
+    served_before = len(provider.served)
+    start = time.perf_counter()
+    scheduled(provider, INTERACTIVE, scheduler).info('MSFT')
+    wait = time.perf_counter() - start
+    for future in batch:
+        future.result()
+    scheduler.shutdown()
+    position = provider.served.index('MSFT')
+    # Fetches already running when the request arrived may finish first; nothing queued may
+    _check(position <= served_before + workers,
+           f'interactive request served {position + 1}th of {len(provider.served)} with {served_before} started before it')
+    return {'elapsed_s': wait, 'backlog': backlog, 'served_position': position + 1,
+            'batch_served_before': position}
+
+
+# Function to run requests against a provider that throttles (429) above its rate limit and at random;
+# every request must still complete through backoff and retries
+def bench_rate_limited(requests=20):
+    provider = FlakyProvider(latency=0.01, max_rate=5, throttle_probability=0.1, seed=1)
+    scheduler = FetchScheduler(rate=4, burst=4, workers=8, retries=6, backoff_base=0.2)
+    start = time.perf_counter()
+    futures = [scheduler.submit(('history', n), partial(provider.history, 'AAPL', f'{n + 1}d'), BATCH)
+               for n in range(requests)]
+    failed = [future.exception() for future in futures if future.exception() is not None]
+    elapsed = time.perf_counter() - start
+    stats = scheduler.stats()
+    scheduler.shutdown()
+    _check(not failed, f'{len(failed)} of {requests} requests failed under throttling: {failed[:1]}')
+    _check(stats['rate_limited'] == provider.throttled, 'not every 429 was retried')
+    return {'elapsed_s': elapsed, 'requests': requests, 'throttled': provider.throttled,
+            'retried': stats['retried']}
+
+
+# Function to check the fetch scheduler's deduplication, priority lanes and 429 handling against
+# a local fake provider; raises RuntimeError when a guarantee does not hold
+def bench_scheduler():
+    return {
+        'scheduler.deduplication': bench_deduplication(),
+        'scheduler.preemption': bench_preemption(),
+        'scheduler.rate_limited': bench_rate_limited(),
+    }
+
+
+if __name__ == '__main__':
+    for name, result in bench_scheduler().items():
+        print(f'{name:30s}', ', '.join(f'{key}={value:.4g}' for key, value in result.items()))
@@ -0,0 +1,251 @@
+import hashlib
+import os
+import pickle
+import re
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from fetch_scheduler import scheduled
+from providers import get_provider
+
+# Default cache location and size, overridable through the environment
+CACHE_DIR = os.environ.get('DCF_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'dcf'))
+MAX_CACHE_BYTES = int(os.environ.get('DCF_CACHE_MAX_BYTES', 512 * 1024 * 1024))
+OFFLINE = os.environ.get('DCF_OFFLINE', '0').lower() in ('1', 'true', 'yes')
+MAX_MEMORY_CACHE_BYTES = int(os.environ.get('DCF_MEMORY_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+
+# Shared worker threads for prefetching a ticker's independent payloads concurrently
+PREFETCH_WORKERS = int(os.environ.get('DCF_PREFETCH_WORKERS', 8))
+_prefetch_pool = ThreadPoolExecutor(max_workers=PREFETCH_WORKERS, thread_name_prefix='dcf-prefetch')
+
+# Time to live (seconds) for each payload type: prices move intraday, statements change quarterly
+TTL = {
+    'info': 60 * 60,
+    'history': 15 * 60,
+    'financials': 90 * 24 * 60 * 60,
+    'cashflow': 90 * 24 * 60 * 60,
+    'balance_sheet': 90 * 24 * 60 * 60,
+}
+
+
+# On-disk cache of pickled payloads with per-type TTL and LRU size eviction.
+# The file's modification time records the last access, the pickle records when it was fetched.
+class DiskCache:
+    def __init__(self, cache_dir=CACHE_DIR, max_bytes=MAX_CACHE_BYTES, ttl=None, offline=OFFLINE):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.ttl = dict(TTL, **(ttl or {}))
+        self.offline = offline
+        os.makedirs(cache_dir, exist_ok=True)
+
+    # Function to map a cache key to its file; payloads from different data sources get different files
+    def _path(self, ticker, kind, *args, source=None):
+        key = '_'.join([ticker.upper(), kind] + [str(a) for a in args])
+        if source is not None:
+            # Long sources (such as local paths) are hashed to keep file names short
+            prefix = source if len(source) <= 32 else hashlib.sha1(source.encode()).hexdigest()[:16]
+            key = f'{prefix}_{key}'
+        return os.path.join(self.cache_dir, re.sub(r'[^A-Za-z0-9_.=-]', '-', key) + '.pkl')
+
+    def _read(self, path):
+        try:
+            with open(path, 'rb') as f:
+                fetched_at, payload = pickle.load(f)
+            os.utime(path)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None, None
+        return fetched_at, payload
+
+    def _write(self, path, payload, fetched_at):
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump((fetched_at, payload), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+        self.evict()
+
+    # Function to return a cached payload, calling fetch() when it is missing or expired
+    def get(self, ticker, kind, fetch, *args, source=None):
+        return self.get_entry(ticker, kind, fetch, *args, source=source)[1]
+
+    # Function to return (fetched_at, payload) for a cached payload, fetching it when missing or expired
+    def get_entry(self, ticker, kind, fetch, *args, source=None):
+        path = self._path(ticker, kind, *args, source=source)
+        fetched_at, payload = self._read(path)
+        if self.offline:
+            if fetched_at is None:
+                raise LookupError(f'No cached {kind} for {ticker} (offline mode)')
+            return fetched_at, payload
+        if fetched_at is not None and time.time() - fetched_at < self.ttl[kind]:
+            return fetched_at, payload
+        payload = fetch()
+        fetched_at = time.time()
+        self._write(path, payload, fetched_at)
+        return fetched_at, payload
+
+    # Function to delete least recently used entries until the cache fits in max_bytes
+    def evict(self):
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith('.pkl'):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total_size <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total_size -= size
+
+    def clear(self):
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith('.pkl'):
+                os.remove(entry.path)
+
+
+# Function to estimate the memory held by a payload: exact for pandas objects, pickled size otherwise
+def _payload_size(payload):
+    memory_usage = getattr(payload, 'memory_usage', None)
+    if memory_usage is not None:
+        usage = memory_usage(deep=True)
+        return int(getattr(usage, 'sum', lambda: usage)())
+    return len(pickle.dumps(payload, protocol=pickle.HIGHEST_PROTOCOL))
+
+
+# Process-wide in-memory cache shared by every session and thread, in front of the disk cache.
+# Concurrent requests for the same key are coalesced: the first caller fetches, the others wait
+# for its result, so fifty sessions opening AAPL at once cost one upstream call. Entries expire
+# after the TTL of their payload type and the least recently used are evicted beyond max_bytes.
+# Payloads are shared, not copied: callers must treat them as read-only.
+class MemoryCache:
+    def __init__(self, max_bytes=MAX_MEMORY_CACHE_BYTES, ttl=None):
+        self.max_bytes = max_bytes
+        self.ttl = dict(TTL, **(ttl or {}))
+        self._entries = OrderedDict()
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        self._size = 0
+        self._counters = dict.fromkeys(('hits', 'misses', 'coalesced', 'expirations', 'evictions', 'errors'), 0)
+
+    # Function to return the cached payload for (source, ticker, kind, *args), calling fetch() at most
+    # once per key at a time when it is missing or expired
+    def get(self, ticker, kind, fetch, *args, source=None):
+        return self.get_entry(ticker, kind, lambda: (time.time(), fetch()), *args, source=source)
+
+    # Function like get, for fetches that return (fetched_at, payload), e.g. DiskCache.get_entry;
+    # the entry then expires one TTL after fetched_at rather than after it was loaded into memory
+    def get_entry(self, ticker, kind, fetch_entry, *args, source=None):
+        key = (source, ticker.upper(), kind) + args
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, size, payload = entry
+                if time.time() < expires_at:
+                    self._entries.move_to_end(key)
+                    self._counters['hits'] += 1
+                    return payload
+                self._remove(key)
+                self._counters['expirations'] += 1
+            pending = self._in_flight.get(key)
+            owner = pending is None
+            if owner:
+                pending = self._in_flight[key] = Future()
+                self._counters['misses'] += 1
+            else:
+                self._counters['coalesced'] += 1
+        if not owner:
+            return pending.result()
+
+        try:
+            fetched_at, payload = fetch_entry()
+        except BaseException as e:
+            with self._lock:
+                del self._in_flight[key]
+                self._counters['errors'] += 1
+            pending.set_exception(e)
+            raise
+        size = _payload_size(payload)
+        with self._lock:
+            del self._in_flight[key]
+            if size <= self.max_bytes:
+                self._entries[key] = (fetched_at + self.ttl[kind], size, payload)
+                self._size += size
+                self._evict()
+        pending.set_result(payload)
+        return payload
+
+    def _remove(self, key):
+        _, size, _ = self._entries.pop(key)
+        self._size -= size
+
+    def _evict(self):
+        while self._size > self.max_bytes and self._entries:
+            self._remove(next(iter(self._entries)))
+            self._counters['evictions'] += 1
+
+    # Function to report hit/miss/eviction counters and the current footprint
+    def stats(self):
+        with self._lock:
+            return dict(self._counters, entries=len(self._entries), bytes=self._size, max_bytes=self.max_bytes)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+
+# Cache shared by every CachedTicker in the process (all Streamlit sessions)
+memory_cache = MemoryCache()
+
+
+# Drop-in stand-in for yf.Ticker that serves info, history and statements from a market data
+# provider, through the process-wide memory cache and the disk cache when the provider's
+# responses are cacheable. The default provider runs in the fetch scheduler's interactive lane.
+class CachedTicker:
+    def __init__(self, ticker, cache=None, provider=None, memory=None):
+        self.ticker = ticker
+        self.provider = provider or scheduled(get_provider())
+        self.cache = cache or DiskCache()
+        self.memory = memory or memory_cache
+
+    def _get(self, kind, fetch, *args):
+        if not self.provider.cacheable:
+            return fetch()
+        # Keys include the provider's source, so tickers fetched from different providers never mix
+        source = self.provider.source
+        return self.memory.get_entry(
+            self.ticker, kind, lambda: self.cache.get_entry(self.ticker, kind, fetch, *args, source=source),
+            *args, source=source)
+
+    @property
+    def info(self):
+        return self._get('info', lambda: self.provider.info(self.ticker))
+
+    @property
+    def financials(self):
+        return self._get('financials', lambda: self.provider.financials(self.ticker))
+
+    @property
+    def cashflow(self):
+        return self._get('cashflow', lambda: self.provider.cashflow(self.ticker))
+
+    @property
+    def balance_sheet(self):
+        return self._get('balance_sheet', lambda: self.provider.balance_sheet(self.ticker))
+
+    def history(self, period='1mo'):
+        return self._get('history', lambda: self.provider.history(self.ticker, period=period), period)
+
+    # Function to start fetching info, history and financials at once
+    # Returns futures keyed by payload type, so callers can render each section as its data arrives.
+    def prefetch(self, period='5y'):
+        return {
+            'info': _prefetch_pool.submit(lambda: self.info),
+            'history': _prefetch_pool.submit(self.history, period=period),
+            'financials': _prefetch_pool.submit(lambda: self.financials),
+        }
@@ -0,0 +1,418 @@
+import functools
+
+import numpy as np
+
+# Number of scenarios valued per block, small enough for one block's year rows to stay in cache
+CHUNK_SIZE = 16384
+
+# Function to broadcast scenario inputs to a common shape and flatten them
+# Inputs are float64 unless dtypes gives another dtype per input (e.g. integer horizons).
+def _as_scenarios(*arrays, dtypes=None):
+    dtypes = dtypes or (np.float64,) * len(arrays)
+    arrays = np.broadcast_arrays(*[np.asarray(a, dtype=dtype) for a, dtype in zip(arrays, dtypes)])
+    shape = arrays[0].shape
+    return shape, [np.ascontiguousarray(a).ravel() for a in arrays]
+
+# Function to value a batch of DCF scenarios with array operations
+# first_year_growth=False matches calculate_dcf (DCF2.py): year 1 cash flow is the current FCF.
+# first_year_growth=True matches calculate_fair_value (DCF1.py): year 1 cash flow is already grown.
+# stub and mid_year move the cash flows off integer year ends, see _period_adjustment.
+# Everything except allocating the outputs runs per block of CHUNK_SIZE scenarios, so the year
+# rows and temporaries stay in cache; the outputs are written once each.
+def _dcf_batch(fcf, growth_rate, discount_rate, terminal_growth_rate, num_years, first_year_growth,
+               stub=1.0, mid_year=False):
+    shape, (fcf, growth_rate, discount_rate, terminal_growth_rate, num_years) = _as_scenarios(
+        fcf, growth_rate, discount_rate, terminal_growth_rate, np.trunc(num_years).astype(np.int64),
+        dtypes=(np.float64,) * 4 + (np.int64,))
+    if np.ndim(stub):
+        stub = np.broadcast_to(np.asarray(stub, dtype=np.float64), shape).ravel()
+    if np.any(num_years < 1):
+        raise ValueError('Number of years must be at least 1')
+    max_years = int(num_years.max()) if num_years.size else 1
+    min_years = int(num_years.min()) if num_years.size else 1
+    uniform_horizon = min_years == max_years
+
+    # Years are laid out as rows so every step is one contiguous vector operation
+    discounted_fcf = np.empty((max_years, fcf.size))
+    flat_fcf = discounted_fcf.reshape(-1)
+    total_value = np.empty(fcf.size)
+    terminal_value = np.empty(fcf.size)
+    years = np.arange(min_years, max_years)[:, None]
+    for start in range(0, fcf.size, CHUNK_SIZE):
+        block = slice(start, start + CHUNK_SIZE)
+        rows = discounted_fcf[:, block]
+        horizon = num_years[block]
+        discount = 1 + discount_rate[block]
+
+        # Each year's discounted FCF is the previous one times (1 + g) / (1 + r)
+        ratio = (1 + growth_rate[block]) / discount
+        if first_year_growth:
+            np.multiply(fcf[block], ratio, out=rows[0])
+        else:
+            np.divide(fcf[block], discount, out=rows[0])
+        for year in range(1, max_years):
+            np.multiply(rows[year - 1], ratio, out=rows[year])
+
+        # The terminal value grows from the last projected year, whose FCF is already discounted
+        if uniform_horizon:
+            last_fcf = rows[-1] * (1 + terminal_growth_rate[block])
+        else:
+            last_fcf = flat_fcf.take((horizon - 1) * fcf.size + np.arange(start, start + horizon.size))
+            last_fcf *= 1 + terminal_growth_rate[block]
+            # Years past a scenario's horizon become zero; every scenario runs at least min_years
+            rows[min_years:] *= years < horizon
+        if not first_year_growth:
+            last_fcf *= 1 + growth_rate[block]
+        last_fcf /= discount_rate[block] - terminal_growth_rate[block]
+        rows.sum(axis=0, out=total_value[block])
+        total_value[block] += last_fcf
+        # Undo the discounting: (1 + r) ** n as exp(n * log1p(r))
+        np.multiply(last_fcf, np.exp(horizon * np.log1p(discount_rate[block])), out=terminal_value[block])
+
+    adjustment = _period_adjustment(discount_rate, stub, mid_year)
+    if adjustment is not None:
+        shift, first_period = adjustment
+        total_value = total_value * shift + discounted_fcf[0] * (first_period - shift)
+        discounted_fcf *= shift
+        discounted_fcf[0] *= first_period / shift
+
+    return (total_value.reshape(shape),
+            discounted_fcf.T.reshape(shape + (max_years,)),
+            terminal_value.reshape(shape))
+
+# Function to calculate DCF for many scenarios at once (batched calculate_dcf)
+# Returns enterprise values, per-year discounted FCFs (zero past each scenario's horizon)
+# and undiscounted terminal values as NumPy arrays.
+def calculate_dcf_batch(fcf, growth_rate, wacc, terminal_growth_rate, num_years, stub=1.0, mid_year=False):
+    return _dcf_batch(fcf, growth_rate, wacc, terminal_growth_rate, num_years, first_year_growth=False,
+                      stub=stub, mid_year=mid_year)
+
+# Function to calculate fair value for many scenarios at once (batched calculate_fair_value)
+def calculate_fair_value_batch(fcf, growth_rate, discount_rate, terminal_growth_rate, years=5, stub=1.0, mid_year=False):
+    return _dcf_closed_form(fcf, growth_rate, discount_rate, terminal_growth_rate, years, first_year_growth=True,
+                            stub=stub, mid_year=mid_year)
+
+# Cash flow periods per year of each schedule frequency
+PERIODS_PER_YEAR = {'annual': 1, 'quarterly': 4, 'monthly': 12}
+
+# Function to spread FCF over periods of a frequency, growing at growth_rate / periods per year each period
+# (the first period is fcf / periods per year). Returns one array with periods on the last axis,
+# so fcf and growth_rate may be arrays of scenarios; scale for display at render time.
+def cash_flow_schedule(fcf, growth_rate, num_years, frequency='quarterly'):
+    periods_per_year = PERIODS_PER_YEAR[frequency]
+    fcf = np.asarray(fcf, dtype=np.float64)[..., None]
+    log_growth = np.log1p(np.asarray(growth_rate, dtype=np.float64) / periods_per_year)[..., None]
+    schedule = np.exp(np.arange(int(num_years) * periods_per_year) * log_growth)
+    schedule *= fcf / periods_per_year
+    return schedule
+
+# Function to turn dates into year fractions from the valuation date (actual/365, as XNPV does)
+# Both accept anything np.datetime64 does, and arrays of dates broadcast against each other.
+def year_fractions(dates, valuation_date):
+    dates = np.asarray(dates, dtype='datetime64[D]')
+    return (dates - np.asarray(valuation_date, dtype='datetime64[D]')).astype(np.float64) / 365.0
+
+# Function to list the next num_periods fiscal year ends after the valuation date (periods on the
+# last axis; arrays of dates broadcast against each other). fiscal_year_end may be any past or future
+# year end; it recurs yearly at the same distance from the end of its month, so a month-end year end
+# (Feb 28 included) stays at month end.
+def fiscal_period_ends(valuation_date, fiscal_year_end, num_periods):
+    valuation_date = np.asarray(valuation_date, dtype='datetime64[D]')[..., None]
+    fiscal_year_end = np.asarray(fiscal_year_end, dtype='datetime64[D]')[..., None]
+    # Month arithmetic runs on integer months since 1970-01
+    month = fiscal_year_end.astype('datetime64[M]').astype(np.int64)
+    days_before_month_end = _month_starts(month + 1) - fiscal_year_end
+    # Whole years from the fiscal year end to the valuation date's month, rounded up
+    years_ahead = -((month - valuation_date.astype('datetime64[M]').astype(np.int64)) // 12)
+    first_end = _month_starts(month + 12 * years_ahead + 1) - days_before_month_end
+    years_ahead = years_ahead + (first_end <= valuation_date)
+    return _month_starts(month + 12 * (years_ahead + np.arange(num_periods)) + 1) - days_before_month_end
+
+# Function to turn integer months since 1970-01 into the dates they start on through a lookup table
+# over their range; converting datetime64[M] to days directly does calendar arithmetic per element
+def _month_starts(months):
+    if not months.size:
+        return np.empty(months.shape, dtype='datetime64[D]')
+    first = months.min()
+    table = np.arange(first, months.max() + 1).astype('datetime64[M]').astype('datetime64[D]')
+    return table[months - first]
+
+# Function to measure the stub period of a valuation: the year fraction from the valuation date to
+# the next fiscal year end after it, for the stub argument of the DCF kernels (at most 1)
+def stub_period(valuation_date, fiscal_year_end):
+    next_end = fiscal_period_ends(valuation_date, fiscal_year_end, 1)[..., 0]
+    stub = np.minimum(year_fractions(next_end, valuation_date), 1.0)
+    return stub if stub.ndim else float(stub)
+
+# Function to time the cash flows of a projection whose first period is a stub of `stub` years
+# (0 < stub <= 1, e.g. the rest of the current fiscal year) followed by full years.
+# Returns each period's cash flow time in years from the valuation date and the fraction of a full
+# year's cash flow it carries. With mid_year, cash arrives halfway through each period instead of at its end.
+# stub may be an array (one stub per scenario); times then get a leading scenario axis.
+# These are the evenly spaced times _period_adjustment applies in closed form; dated_cash_flow_times
+# gives the same from actual fiscal year end dates.
+def cash_flow_times(num_years, stub=1.0, mid_year=False):
+    stub = np.asarray(stub, dtype=np.float64)[..., None]
+    period_end = stub + np.arange(num_years)
+    period_length = np.where(np.arange(num_years) == 0, stub, 1.0)
+    times = period_end - period_length / 2 if mid_year else period_end
+    return times, np.broadcast_to(period_length, times.shape)
+
+# Function to time the cash flows of periods ending on the given dates (periods on the last axis),
+# and the fraction of a year's cash flow each carries, as cash_flow_times does for evenly spaced
+# periods: the first period runs from the valuation date and carries at most one year of cash flow;
+# later periods run from one end date to the next and carry a full year.
+def dated_cash_flow_times(period_ends, valuation_date, mid_year=False):
+    period_end = year_fractions(period_ends, np.asarray(valuation_date, dtype='datetime64[D]')[..., None])
+    period_length = np.diff(period_end, axis=-1, prepend=0.0)
+    times = period_end - period_length / 2 if mid_year else period_end
+    # Full fiscal years carry one year of cash flow, leap day or not
+    year_fraction = np.ones_like(period_length)
+    year_fraction[..., 0] = np.minimum(period_length[..., 0], 1.0)
+    return times, year_fraction
+
+# Function to discount dated cash flows for many scenarios at once (vectorized XNPV)
+# cash_flows has periods on the last axis; times (in years, see year_fractions) broadcast against it
+# and discount_rate against its leading axes. Discount factors are exp(-t * log1p(r)), so fractional
+# times cost the same as integer ones.
+def xnpv(cash_flows, times, discount_rate, per_period=False):
+    cash_flows = np.asarray(cash_flows, dtype=np.float64)
+    log_discount = np.log1p(np.asarray(discount_rate, dtype=np.float64))[..., None]
+    discounted = cash_flows * np.exp(-np.asarray(times, dtype=np.float64) * log_discount)
+    if per_period:
+        return discounted
+    present_value = np.sum(discounted, axis=-1)
+    return present_value if present_value.ndim else float(present_value)
+
+# Function to value DCF scenarios from actual dates (dated calculate_dcf_batch): year k's cash flow
+# is fcf * (1 + g) ** (k - 1), the first year only the part after the valuation date, and each is
+# discounted from the fiscal year end it belongs to (its middle with mid_year) with xnpv. The terminal
+# value is discounted with the last period, as in _period_adjustment. Scenario inputs and dates broadcast.
+# cash_flows may pass in that annual schedule (cash_flow_schedule over num_years + 1 years) when the
+# caller already has it, e.g. to chart the same array.
+# Returns enterprise values, per-period discounted FCFs, undiscounted terminal values and the period ends.
+def calculate_dcf_dated(fcf, growth_rate, wacc, terminal_growth_rate, num_years, valuation_date, fiscal_year_end,
+                        mid_year=False, cash_flows=None):
+    num_years = int(num_years)
+    if num_years < 1:
+        raise ValueError('Number of years must be at least 1')
+    wacc = np.asarray(wacc, dtype=np.float64)
+    terminal_growth_rate = np.asarray(terminal_growth_rate, dtype=np.float64)
+    # One year past the projection is the cash flow the terminal value capitalizes
+    if cash_flows is None:
+        cash_flows = cash_flow_schedule(fcf, growth_rate, num_years + 1, 'annual')
+    period_ends = fiscal_period_ends(valuation_date, fiscal_year_end, num_years)
+    times, year_fraction = dated_cash_flow_times(period_ends, valuation_date, mid_year)
+    discounted_fcf = xnpv(cash_flows[..., :-1] * year_fraction, times, wacc, per_period=True)
+    terminal_value = cash_flows[..., -1] * (1 + terminal_growth_rate) / (wacc - terminal_growth_rate)
+    discounted_terminal_value = xnpv(terminal_value[..., None], times[..., -1:], wacc)
+    total_value = discounted_fcf.sum(axis=-1) + discounted_terminal_value
+    if total_value.ndim:
+        return total_value, discounted_fcf, terminal_value, period_ends
+    return float(total_value), discounted_fcf, float(terminal_value), period_ends
+
+# Discount-factor table: (1 + r) ** -t for every rate on a grid of whole basis points from 0 to
+# DISCOUNT_GRID_MAX_RATE and t = 0..DISCOUNT_TABLE_PERIODS, about 2.4 MB, built once per process
+DISCOUNT_GRID_STEPS_PER_UNIT = 10000
+DISCOUNT_GRID_MAX_RATE = 0.5
+DISCOUNT_TABLE_PERIODS = 60
+
+# Function to build (once) the discount-factor table, periods as rows and grid rates as columns
+@functools.lru_cache(maxsize=None)
+def discount_factor_table():
+    rates = np.arange(round(DISCOUNT_GRID_MAX_RATE * DISCOUNT_GRID_STEPS_PER_UNIT) + 1) / DISCOUNT_GRID_STEPS_PER_UNIT
+    table = np.exp(-np.arange(DISCOUNT_TABLE_PERIODS + 1)[:, None] * np.log1p(rates))
+    table.flags.writeable = False
+    return table
+
+# Function to compute discount factors for periods 1..num_periods directly, one row per rate
+def _exact_discount_factors(rates, num_periods):
+    return np.exp(-np.arange(1, num_periods + 1) * np.log1p(rates)[:, None])
+
+# Function to return (1 + r) ** -t for t = 1..num_periods, periods on the last axis
+# Rates on the basis-point grid (r == k / 10000 exactly, as with rates typed in percent) are gathered
+# from the shared table; other rates and horizons past the table are computed directly, with the same
+# formula, so both paths give identical values.
+def discount_factors(discount_rate, num_periods):
+    discount_rate = np.asarray(discount_rate, dtype=np.float64)
+    rates = discount_rate.ravel()
+    with np.errstate(invalid='ignore'):
+        steps = np.rint(rates * DISCOUNT_GRID_STEPS_PER_UNIT)
+        on_grid = ((steps / DISCOUNT_GRID_STEPS_PER_UNIT == rates) & (steps >= 0)
+                   & (rates <= DISCOUNT_GRID_MAX_RATE) & (num_periods <= DISCOUNT_TABLE_PERIODS))
+    table = discount_factor_table()[1:num_periods + 1]
+    if on_grid.all():
+        factors = table.take(steps.astype(np.intp), axis=1).T
+    elif not on_grid.any():
+        factors = _exact_discount_factors(rates, num_periods)
+    else:
+        factors = np.empty((rates.size, num_periods))
+        factors[on_grid] = table.take(steps[on_grid].astype(np.intp), axis=1).T
+        factors[~on_grid] = _exact_discount_factors(rates[~on_grid], num_periods)
+    return factors.reshape(discount_rate.shape + (num_periods,))
+
+# Function to discount cash flows at the end of periods 1..n (periods on the last axis)
+# A shared rate is one dot product against a row of the table; per-scenario rates gather their rows.
+def present_value(cash_flows, discount_rate):
+    cash_flows = np.asarray(cash_flows, dtype=np.float64)
+    if np.ndim(discount_rate) == 0:
+        present = cash_flows @ discount_factors(discount_rate, cash_flows.shape[-1])
+    else:
+        factors = discount_factors(discount_rate, cash_flows.shape[-1])
+        present = np.einsum('...t,...t->...', *np.broadcast_arrays(cash_flows, factors))
+    return present if np.ndim(present) else float(present)
+
+# Function to value every combination of growth, discount and terminal growth rates for one FCF
+# (the sensitivity sweep of calculate_fair_value_batch). The projected cash flows depend only on
+# growth and the discount factors only on the discount rate, so the explicit years are one dot
+# product per (growth, discount) pair against factors gathered from the shared table; only the
+# terminal value is computed per cell. Returns (growth, discount, terminal growth) shaped values.
+def calculate_fair_value_grid(fcf, growth_rates, discount_rates, terminal_growth_rates, years=5):
+    growth = np.asarray(growth_rates, dtype=np.float64)[:, None]
+    discount_rates = np.asarray(discount_rates, dtype=np.float64)
+    terminal_growth = np.asarray(terminal_growth_rates, dtype=np.float64)[None, None, :]
+    years = int(years)
+    # Year t cash flow is fcf * (1 + g) ** t (year 1 already grown, as in calculate_fair_value)
+    cash_flows = fcf * np.exp(np.arange(1, years + 1) * np.log1p(growth))
+    explicit = present_value(cash_flows[:, None, :], discount_rates[None, :])
+    final_discount = discount_factors(discount_rates, years)[:, -1]
+    rates = discount_rates[None, :, None]
+    terminal = (cash_flows[:, -1, None, None] * final_discount[None, :, None] * (1 + terminal_growth)
+                / (rates - terminal_growth))
+    return explicit[..., None] + terminal
+
+# Function to compute how a stub first period and the mid-year convention change a DCF that
+# discounts at integer year ends. Period k >= 1 then ends at stub + k, so it and the terminal value
+# are discounted stub - 1 years less (half a year less again with mid_year, the terminal value moving
+# with the cash flows it capitalizes); the first period only carries stub years of cash flow.
+# Returns the factor for later periods and the terminal value and the factor for the first period,
+# or None when neither option is set.
+def _period_adjustment(discount_rate, stub, mid_year):
+    stub = np.asarray(stub, dtype=np.float64)
+    if not mid_year and np.all(stub == 1):
+        return None
+    if np.any((stub <= 0) | (stub > 1)):
+        raise ValueError('Stub period must be longer than 0 and at most 1 year')
+    log_discount = np.log1p(discount_rate)
+    half = 0.5 if mid_year else 0.0
+    shift = np.exp((1 - stub + half) * log_discount)
+    first_period = stub * np.exp((1 - stub * (1 - half)) * log_discount)
+    return shift, first_period
+
+# Function to value scenarios in closed form, O(1) per scenario: a growing annuity of n cash flows
+# plus the Gordon terminal value. With q = (1 + g) / (1 + r), sum(q**i for i < n) is
+# expm1(n * log1p(q - 1)) / (q - 1), which stays accurate as growth approaches the discount rate
+# and is exactly n when they are equal.
+def _dcf_closed_form(fcf, growth_rate, discount_rate, terminal_growth_rate, num_years, first_year_growth,
+                     stub=1.0, mid_year=False):
+    fcf, growth_rate, discount_rate, terminal_growth_rate, num_years = np.broadcast_arrays(
+        *[np.asarray(a, dtype=np.float64) for a in (fcf, growth_rate, discount_rate, terminal_growth_rate, num_years)])
+    excess = (growth_rate - discount_rate) / (1 + discount_rate)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # q**n - 1; the log form needs q > 0, so declines of 100% or more fall back to a plain power
+        if np.all(excess > -1):
+            growth_factor_minus_one = np.expm1(num_years * np.log1p(excess))
+        else:
+            growth_factor_minus_one = np.where(excess > -1, np.expm1(num_years * np.log1p(np.maximum(excess, -1))),
+                                               (1 + excess) ** num_years - 1)
+        annuity = np.where(excess == 0, num_years, growth_factor_minus_one / excess)
+    first_cash_flow = fcf * (1 + excess) if first_year_growth else fcf / (1 + discount_rate)
+    discounted_terminal_value = (fcf * (growth_factor_minus_one + 1) * (1 + terminal_growth_rate)
+                                 / (discount_rate - terminal_growth_rate))
+    total_value = first_cash_flow * annuity + discounted_terminal_value
+    adjustment = _period_adjustment(discount_rate, stub, mid_year)
+    if adjustment is not None:
+        shift, first_period = adjustment
+        total_value = total_value * shift + first_cash_flow * (first_period - shift)
+    return total_value if total_value.ndim else float(total_value)
+
+# Function to calculate DCF enterprise value only (batched fast path of calculate_dcf)
+# Use this for sweeps; calculate_dcf_batch is only needed when per-year cash flows are displayed.
+def calculate_dcf_value(fcf, growth_rate, wacc, terminal_growth_rate, num_years, stub=1.0, mid_year=False):
+    return _dcf_closed_form(fcf, growth_rate, wacc, terminal_growth_rate, num_years, first_year_growth=False,
+                            stub=stub, mid_year=mid_year)
+
+# Shapes of the fade from high growth to terminal growth; exponential closes most of the gap early
+FADES = ('linear', 'exponential')
+
+# How front-loaded the exponential fade is: the gap shrinks like exp(-rate * k / (fade_years + 1))
+EXPONENTIAL_FADE_RATE = 3.0
+
+# Function to weight terminal growth in each projected year of a multi-stage model
+# Growth in year t is high_growth + (terminal_growth - high_growth) * weight[t]: 0 through the
+# high-growth phase, then rising over the fade years and reaching 1 in the first terminal year.
+def fade_weights(high_growth_years, fade_years, fade='linear'):
+    if fade not in FADES:
+        raise ValueError(f'Unknown fade: {fade}')
+    step = np.arange(1, fade_years + 1) / (fade_years + 1)
+    if fade == 'exponential':
+        step = np.expm1(-EXPONENTIAL_FADE_RATE * step) / np.expm1(-EXPONENTIAL_FADE_RATE)
+    return np.concatenate([np.zeros(int(high_growth_years)), step])
+
+# Function to value scenarios with a high-growth phase, a fade to terminal growth and a Gordon terminal value
+# Growth varies by year, so each block of scenarios is laid out as a (years x scenarios) matrix:
+# cumulative log growth down the rows, minus the log discount, exponentiated once.
+# Year 1 cash flow is the current FCF (as in calculate_dcf) unless first_year_growth is set (as in
+# calculate_fair_value). With fade_years=0 this equals the single-stage model over high_growth_years.
+def _multistage(fcf, high_growth_rate, discount_rate, terminal_growth_rate, high_growth_years, fade_years,
+                fade, first_year_growth, stub, mid_year, per_year):
+    shape, (fcf, high_growth_rate, discount_rate, terminal_growth_rate, stub) = _as_scenarios(
+        fcf, high_growth_rate, discount_rate, terminal_growth_rate, stub)
+    weights = fade_weights(high_growth_years, fade_years, fade)[:, None]
+    num_years = weights.shape[0]
+    if num_years < 1:
+        raise ValueError('Number of years must be at least 1')
+    # Year t is discounted over t + 1 years; cash flow growth runs up to year t - 1 (or t with first_year_growth)
+    discount_years = np.arange(1, num_years + 1)[:, None]
+
+    discounted_fcf = np.empty((num_years, fcf.size)) if per_year else None
+    total_value = np.empty(fcf.size)
+    terminal_value = np.empty(fcf.size)
+    # Discounted year 1 cash flow, which a stub or mid-year adjustment treats on its own
+    first_cash_flow = np.empty(fcf.size)
+    for start in range(0, fcf.size, CHUNK_SIZE):
+        block = slice(start, start + CHUNK_SIZE)
+        high_growth = high_growth_rate[block]
+        log_growth = np.log1p(high_growth + (terminal_growth_rate[block] - high_growth) * weights)
+        cumulative_growth = np.cumsum(log_growth, axis=0)
+        rows = cumulative_growth - log_growth if not first_year_growth else cumulative_growth.copy()
+        rows -= discount_years * np.log1p(discount_rate[block])
+        np.exp(rows, out=rows)
+        rows *= fcf[block]
+        rows.sum(axis=0, out=total_value[block])
+        first_cash_flow[block] = rows[0]
+        terminal_value[block] = (fcf[block] * np.exp(cumulative_growth[-1]) * (1 + terminal_growth_rate[block])
+                                 / (discount_rate[block] - terminal_growth_rate[block]))
+        if per_year:
+            discounted_fcf[:, block] = rows
+    total_value += terminal_value / (1 + discount_rate) ** num_years
+
+    adjustment = _period_adjustment(discount_rate, stub, mid_year)
+    if adjustment is not None:
+        shift, first_period = adjustment
+        total_value = total_value * shift + first_cash_flow * (first_period - shift)
+        if per_year:
+            discounted_fcf *= shift
+            discounted_fcf[0] *= first_period / shift
+
+    if not per_year:
+        return total_value.reshape(shape) if shape else float(total_value[0])
+    return (total_value.reshape(shape),
+            discounted_fcf.T.reshape(shape + (num_years,)),
+            terminal_value.reshape(shape))
+
+# Function to calculate multi-stage DCF values only, for sweeps
+# The arguments line up with calculate_dcf_value (num_years is the length of the high-growth phase),
+# so functools.partial(calculate_multistage_value, fade_years=...) can stand in for it in
+# run_monte_carlo and sensitivity_grid.
+def calculate_multistage_value(fcf, growth_rate, discount_rate, terminal_growth_rate, num_years, fade_years=5,
+                               fade='linear', first_year_growth=False, stub=1.0, mid_year=False):
+    return _multistage(fcf, growth_rate, discount_rate, terminal_growth_rate, num_years, fade_years,
+                       fade, first_year_growth, stub, mid_year, per_year=False)
+
+# Function to calculate multi-stage DCF for many scenarios, with per-year discounted FCFs
+# (over high-growth and fade years) and undiscounted terminal values
+def calculate_multistage_batch(fcf, growth_rate, discount_rate, terminal_growth_rate, num_years, fade_years=5,
+                               fade='linear', first_year_growth=False, stub=1.0, mid_year=False):
+    return _multistage(fcf, growth_rate, discount_rate, terminal_growth_rate, num_years, fade_years,
+                       fade, first_year_growth, stub, mid_year, per_year=True)
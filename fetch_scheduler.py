@@ -0,0 +1,295 @@
+import heapq
+import itertools
+import os
+import random
+import threading
+import time
+from concurrent.futures import Future
+
+from providers import MarketDataProvider, RateLimitError
+
+# Priority lanes: lower runs first, so interactive page loads overtake queued batch fetches
+INTERACTIVE = 0
+BATCH = 1
+
+# Process-wide upstream budget, overridable through the environment
+FETCH_RATE = float(os.environ.get('DCF_FETCH_RATE', 5.0))
+FETCH_BURST = int(os.environ.get('DCF_FETCH_BURST', 10))
+FETCH_WORKERS = int(os.environ.get('DCF_FETCH_WORKERS', 8))
+FETCH_RETRIES = int(os.environ.get('DCF_FETCH_RETRIES', 3))
+
+# Exponential backoff: retry n waits a random time up to min(BACKOFF_MAX, BACKOFF_BASE * 2 ** n) seconds
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 30.0
+
+# Errors that mean the data does not exist; retrying cannot help
+PERMANENT_ERRORS = (LookupError, NotImplementedError, ValueError)
+
+
+# Thread-safe token bucket: `rate` tokens per second, holding at most `burst`
+# pause() empties the bucket for a while, which is how upstream throttling slows every caller at once.
+class TokenBucket:
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    # Function to block until a token is available and take it
+    def acquire(self):
+        if not self.rate:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now < self._paused_until:
+                    wait = self._paused_until - now
+                elif self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                else:
+                    wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+    # Function to give back a token that was taken but not used
+    def release(self):
+        with self._lock:
+            self._tokens = min(self.burst, self._tokens + 1)
+
+    def pause(self, seconds):
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._tokens = 0.0
+
+
+# Function to pick a backoff delay with full jitter, so throttled clients do not retry in lockstep
+def backoff_delay(attempt, base=BACKOFF_BASE, cap=BACKOFF_MAX, rng=random):
+    return rng.uniform(0, min(cap, base * 2 ** attempt))
+
+
+class _Job:
+    def __init__(self, key, fetch, priority):
+        self.key = key
+        self.fetch = fetch
+        self.priority = priority
+        self.attempt = 0
+        self.queued = False
+        self.future = Future()
+
+
+# Central scheduler for upstream data calls.
+# Requests are queued by priority lane and run on a few worker threads, each taking a token from
+# the shared bucket first. Identical requests (same key) that are still pending share one fetch,
+# and a more urgent duplicate promotes the queued request to its lane. Failures are retried with
+# jittered exponential backoff; a RateLimitError also pauses the bucket for that delay.
+class FetchScheduler:
+    def __init__(self, rate=FETCH_RATE, burst=FETCH_BURST, workers=FETCH_WORKERS, retries=FETCH_RETRIES,
+                 backoff_base=BACKOFF_BASE, backoff_max=BACKOFF_MAX):
+        self.bucket = TokenBucket(rate, burst)
+        self.workers = workers
+        self.retries = retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._queue = []
+        self._sequence = itertools.count()
+        self._pending = {}
+        self._condition = threading.Condition()
+        self._threads = []
+        self._closed = False
+        self._counters = dict.fromkeys(('submitted', 'deduplicated', 'completed', 'failed', 'retried', 'rate_limited'), 0)
+
+    def _start_workers(self):
+        while len(self._threads) < self.workers:
+            thread = threading.Thread(target=self._work, name=f'dcf-fetch-{len(self._threads)}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _push(self, job):
+        with self._condition:
+            job.queued = True
+            heapq.heappush(self._queue, (job.priority, next(self._sequence), job))
+            self._condition.notify()
+
+    # Function to queue fetch() under key and return a Future for its result
+    def submit(self, key, fetch, priority=INTERACTIVE):
+        with self._condition:
+            if self._closed:
+                raise RuntimeError('Fetch scheduler has been shut down')
+            self._counters['submitted'] += 1
+            job = self._pending.get(key)
+            if job is not None:
+                self._counters['deduplicated'] += 1
+                if job.queued and priority < job.priority:
+                    # Queue it again in the faster lane; the stale entry is skipped when popped
+                    job.priority = priority
+                    heapq.heappush(self._queue, (priority, next(self._sequence), job))
+                    self._condition.notify()
+                return job.future
+            job = self._pending[key] = _Job(key, fetch, priority)
+            self._start_workers()
+        self._push(job)
+        return job.future
+
+    # Function to run fetch() through the scheduler and wait for its result
+    def call(self, key, fetch, priority=INTERACTIVE):
+        return self.submit(key, fetch, priority).result()
+
+    def _next_job(self):
+        with self._condition:
+            while self._queue:
+                priority, _, job = heapq.heappop(self._queue)
+                if priority == job.priority and job.queued:
+                    job.queued = False
+                    return job
+        return None
+
+    def _work(self):
+        while True:
+            with self._condition:
+                while not self._queue and not self._closed:
+                    self._condition.wait()
+                if self._closed:
+                    return
+            # Take the token before choosing the job, so the most urgent job queued by then gets it
+            self.bucket.acquire()
+            job = self._next_job()
+            if job is None:
+                self.bucket.release()
+                continue
+            self._run(job)
+
+    def _run(self, job):
+        try:
+            result = job.fetch()
+        except PERMANENT_ERRORS as e:
+            self._finish(job, error=e)
+        except Exception as e:
+            if job.attempt >= self.retries:
+                self._finish(job, error=e)
+                return
+            delay = backoff_delay(job.attempt, self.backoff_base, self.backoff_max)
+            job.attempt += 1
+            with self._condition:
+                self._counters['retried'] += 1
+                if isinstance(e, RateLimitError):
+                    self._counters['rate_limited'] += 1
+            if isinstance(e, RateLimitError):
+                self.bucket.pause(delay)
+            timer = threading.Timer(delay, self._push, (job,))
+            timer.daemon = True
+            timer.start()
+        else:
+            self._finish(job, result=result)
+
+    def _finish(self, job, result=None, error=None):
+        with self._condition:
+            del self._pending[job.key]
+            self._counters['failed' if error is not None else 'completed'] += 1
+        if error is not None:
+            job.future.set_exception(error)
+        else:
+            job.future.set_result(result)
+
+    # Function to stop the worker threads once they finish their current fetch
+    # Requests still queued are not run; call this when every submitted request has completed.
+    def shutdown(self):
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        for thread in self._threads:
+            if thread is not threading.current_thread():
+                thread.join()
+
+    # Function to report request counters and the number of queued requests per lane
+    def stats(self):
+        with self._condition:
+            queued = {}
+            for priority, _, job in self._queue:
+                if priority == job.priority and job.queued:
+                    queued[priority] = queued.get(priority, 0) + 1
+            return dict(self._counters, queued_interactive=queued.get(INTERACTIVE, 0),
+                        queued_batch=queued.get(BATCH, 0), in_flight=len(self._pending))
+
+
+# Market data provider that routes every call of another provider through a scheduler lane
+class ScheduledProvider(MarketDataProvider):
+    def __init__(self, provider, scheduler=None, priority=INTERACTIVE):
+        self.provider = provider
+        self.scheduler = scheduler or default_scheduler()
+        self.priority = priority
+
+    @property
+    def cacheable(self):
+        return self.provider.cacheable
+
+    @property
+    def rate_limited(self):
+        return self.provider.rate_limited
+
+    @property
+    def source(self):
+        return self.provider.source
+
+    def _call(self, name, ticker, *args):
+        key = (self.provider.source, name, ticker.upper()) + args
+        return self.scheduler.call(key, lambda: getattr(self.provider, name)(ticker, *args), self.priority)
+
+    def info(self, ticker):
+        return self._call('info', ticker)
+
+    def history(self, ticker, period='5y'):
+        return self._call('history', ticker, period)
+
+    def history_range(self, ticker, start, end=None):
+        return self._call('history_range', ticker, start, end)
+
+    def financials(self, ticker):
+        return self._call('financials', ticker)
+
+    def cashflow(self, ticker):
+        return self._call('cashflow', ticker)
+
+    def balance_sheet(self, ticker):
+        return self._call('balance_sheet', ticker)
+
+
+_default_scheduler = None
+_default_scheduler_pid = None
+_default_scheduler_lock = threading.Lock()
+
+
+# Function to return the scheduler shared by the whole process, creating it on first use
+# (and again in a forked worker process, where the parent's worker threads do not exist)
+def default_scheduler():
+    global _default_scheduler, _default_scheduler_pid
+    with _default_scheduler_lock:
+        if _default_scheduler is None or _default_scheduler_pid != os.getpid():
+            _default_scheduler = FetchScheduler()
+            _default_scheduler_pid = os.getpid()
+        return _default_scheduler
+
+
+# Function to replace the scheduler shared by this process, e.g. with one holding a worker process's
+# share of the upstream budget
+def set_default_scheduler(scheduler):
+    global _default_scheduler, _default_scheduler_pid
+    with _default_scheduler_lock:
+        _default_scheduler = scheduler
+        _default_scheduler_pid = os.getpid()
+
+
+# Function to route a provider through a scheduler lane (re-laning an already scheduled provider)
+# Providers that are not rate limited, such as local snapshots, are returned unchanged.
+def scheduled(provider, priority=INTERACTIVE, scheduler=None):
+    if isinstance(provider, ScheduledProvider):
+        return ScheduledProvider(provider.provider, scheduler or provider.scheduler, priority)
+    if not provider.rate_limited:
+        return provider
+    return ScheduledProvider(provider, scheduler, priority)
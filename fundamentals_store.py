@@ -0,0 +1,160 @@
+import json
+import os
+import time
+
+import numpy as np
+
+# info fields kept in a snapshot, one float64 column each
+FIELDS = (
+    'currentPrice', 'previousClose', 'marketCap', 'sharesOutstanding', 'freeCashflow', 'totalRevenue',
+    'totalDebt', 'trailingPE', 'forwardPE', 'priceToSalesTrailing12Months', 'priceToBook',
+    'profitMargins', 'dividendYield', 'targetMeanPrice',
+)
+
+# Width of the fixed-width ticker index
+TICKER_WIDTH = 16
+
+# Most annual reports kept per ticker in a snapshot's statement history
+STATEMENT_YEARS = 8
+
+# Report date of an empty statement slot
+NO_REPORT = np.iinfo(np.int64).min
+
+
+# Columnar fundamentals for a whole universe of tickers, stored in a directory as
+#   columns.npy  float64 array shaped (fields, tickers); each field is one contiguous row
+#   tickers.npy  fixed-width unicode ticker index
+#   meta.json    field names and creation time
+# and optionally the annual statement history, newest report last and NaN-padded at the start:
+#   statements.npy    float64 array shaped (statement fields, tickers, STATEMENT_YEARS)
+#   report_dates.npy  int64 nanoseconds shaped (tickers, STATEMENT_YEARS), NO_REPORT where empty
+# All arrays are memory-mapped on load, so opening a snapshot is O(1) and snapshot[field]
+# is a zero-copy view that the batched valuation functions consume directly. Missing values are NaN.
+class FundamentalsSnapshot:
+    def __init__(self, tickers, fields, columns, created_at=None, statement_fields=(), statements=None,
+                 report_dates=None):
+        self.tickers = tickers
+        self.fields = tuple(fields)
+        self.columns = columns
+        self.created_at = created_at
+        self.statement_fields = tuple(statement_fields)
+        self.statements = statements
+        self.report_dates = report_dates
+        self._field_index = {field: i for i, field in enumerate(self.fields)}
+        self._statement_index = {field: i for i, field in enumerate(self.statement_fields)}
+        self._ticker_index = None
+
+    @classmethod
+    def load(cls, path):
+        with open(os.path.join(path, 'meta.json')) as f:
+            meta = json.load(f)
+        statements = report_dates = None
+        if meta.get('statement_fields'):
+            statements = np.load(os.path.join(path, 'statements.npy'), mmap_mode='r')
+            report_dates = np.load(os.path.join(path, 'report_dates.npy'), mmap_mode='r')
+        return cls(np.load(os.path.join(path, 'tickers.npy'), mmap_mode='r'), meta['fields'],
+                   np.load(os.path.join(path, 'columns.npy'), mmap_mode='r'), meta.get('created_at'),
+                   meta.get('statement_fields', ()), statements, report_dates)
+
+    def __len__(self):
+        return len(self.tickers)
+
+    def __contains__(self, field):
+        return field in self._field_index
+
+    def __getitem__(self, field):
+        return self.columns[self._field_index[field]]
+
+    # Function to return one statement line item for every ticker, shaped (tickers, STATEMENT_YEARS)
+    def statement(self, field):
+        return self.statements[self._statement_index[field]]
+
+    # Function to find a ticker's position; the lookup table is built on first use only
+    def position(self, ticker):
+        if self._ticker_index is None:
+            self._ticker_index = {str(t): i for i, t in enumerate(self.tickers)}
+        return self._ticker_index[ticker.upper()]
+
+    # Function to return one ticker's fields as an info-style dict (NaN fields left out)
+    def info(self, ticker):
+        values = self.columns[:, self.position(ticker)]
+        return {field: float(v) for field, v in zip(self.fields, values) if not np.isnan(v)}
+
+
+# Function to lay out per-ticker statement histories as (fields, tickers, STATEMENT_YEARS) arrays
+# statements holds (report dates, {field: values}) per ticker, oldest first as backtest.load_fundamentals
+# returns them, or None; only the newest STATEMENT_YEARS reports are kept.
+def _statement_arrays(statements):
+    statement_fields = list(dict.fromkeys(field for s in statements if s is not None for field in s[1]))
+    values = np.full((len(statement_fields), len(statements), STATEMENT_YEARS), np.nan)
+    report_dates = np.full((len(statements), STATEMENT_YEARS), NO_REPORT, dtype=np.int64)
+    for j, statement in enumerate(statements):
+        if statement is None:
+            continue
+        dates, columns = statement
+        kept = min(len(dates), STATEMENT_YEARS)
+        if not kept:
+            continue
+        report_dates[j, -kept:] = dates[-kept:]
+        for i, field in enumerate(statement_fields):
+            if field in columns:
+                values[i, j, -kept:] = columns[field][-kept:]
+    return statement_fields, values, report_dates
+
+
+# Function to write info dicts (and optionally statement histories) for many tickers as a snapshot directory
+def write_snapshot(path, tickers, infos, fields=FIELDS, created_at=None, statements=None):
+    os.makedirs(path, exist_ok=True)
+    columns = np.full((len(fields), len(tickers)), np.nan)
+    for j, info in enumerate(infos):
+        for i, field in enumerate(fields):
+            value = (info or {}).get(field)
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                columns[i, j] = value
+    ticker_index = np.array([t.upper() for t in tickers], dtype=f'<U{TICKER_WIDTH}')
+    arrays = [('columns.npy', columns), ('tickers.npy', ticker_index)]
+    statement_fields = []
+    if statements is not None:
+        statement_fields, values, report_dates = _statement_arrays(statements)
+        arrays += [('statements.npy', values), ('report_dates.npy', report_dates)]
+    for name, array in arrays:
+        tmp_path = os.path.join(path, name + '.tmp')
+        with open(tmp_path, 'wb') as f:
+            np.save(f, array)
+        os.replace(tmp_path, os.path.join(path, name))
+    with open(os.path.join(path, 'meta.json'), 'w') as f:
+        json.dump({'fields': list(fields), 'created_at': created_at, 'statement_fields': statement_fields}, f)
+    return FundamentalsSnapshot.load(path)
+
+
+# Function to fetch info for a ticker universe concurrently and save it as a snapshot
+# With statements, each ticker's annual statements are fetched too (three more requests per ticker,
+# in the fetch scheduler's batch lane), so growth can be estimated for the whole universe at once.
+def build_snapshot(path, tickers, provider=None, max_workers=16, rate=None, retries=None, statements=False):
+    from screener import fetch_universe
+    rows = fetch_universe(tickers, provider=provider, max_workers=max_workers, rate=rate, retries=retries)
+    fetched = [row for row in rows if 'info' in row]
+    histories = None
+    if statements:
+        histories = fetch_statements([row['ticker'] for row in fetched], provider, max_workers)
+    return write_snapshot(path, [row['ticker'] for row in fetched], [row['info'] for row in fetched],
+                          created_at=time.time(), statements=histories)
+
+
+# Function to load annual statements for many tickers concurrently, None for tickers that fail
+def fetch_statements(tickers, provider=None, max_workers=16):
+    from concurrent.futures import ThreadPoolExecutor
+    from backtest import load_fundamentals
+    from data_cache import CachedTicker
+    from fetch_scheduler import BATCH, scheduled
+    from providers import get_provider
+    provider = scheduled(provider or get_provider(), BATCH)
+
+    def load(ticker):
+        try:
+            return load_fundamentals(CachedTicker(ticker, provider=provider))
+        except Exception:
+            return None
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(load, tickers))
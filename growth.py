@@ -0,0 +1,108 @@
+import numpy as np
+
+# Fewest annual values a CAGR, trend or volatility is estimated from
+MIN_OBSERVATIONS = 3
+
+# Range a proposed growth rate is clipped to before it is offered as a DCF default
+MIN_PROPOSED_GROWTH = -0.10
+MAX_PROPOSED_GROWTH = 0.25
+
+# Estimates tried in order when proposing a growth rate; the first finite one is used
+PROPOSAL_ORDER = ('fcf_trend_growth', 'fcf_cagr', 'revenue_trend_growth', 'revenue_cagr')
+
+NANOSECONDS_PER_YEAR = 365.25 * 24 * 60 * 60 * 10 ** 9
+
+
+# Function to turn report dates (int64 nanoseconds, any integer below 0 for no report) into years
+# since the Unix epoch as floats, NaN where there is no report
+def report_years(report_dates):
+    report_dates = np.asarray(report_dates, dtype=np.int64)
+    return np.where(report_dates > 0, report_dates / NANOSECONDS_PER_YEAR, np.nan)
+
+
+# Function to return an all-NaN estimate for rows without any report columns
+def _no_reports(values):
+    return np.full(values.shape[:-1], np.nan)
+
+
+# Function to compute the compound annual growth rate between each row's first and last reported
+# value (columns are report dates, oldest first, NaN where missing). NaN when either end is not
+# positive, or fewer than MIN_OBSERVATIONS values are reported.
+def cagr(values, times):
+    values = np.asarray(values, dtype=np.float64)
+    if not values.shape[-1]:
+        return _no_reports(values)
+    reported = np.isfinite(values) & np.isfinite(times)
+    count = reported.sum(axis=-1)
+    first = np.argmax(reported, axis=-1)[..., None]
+    last = values.shape[-1] - 1 - np.argmax(reported[..., ::-1], axis=-1)[..., None]
+    start, end = np.take_along_axis(values, first, -1)[..., 0], np.take_along_axis(values, last, -1)[..., 0]
+    span = np.take_along_axis(times, last, -1)[..., 0] - np.take_along_axis(times, first, -1)[..., 0]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        growth = np.expm1(np.log(end / start) / span)
+    return np.where((count >= MIN_OBSERVATIONS) & (start > 0) & (end > 0) & (span > 0), growth, np.nan)
+
+
+# Function to fit log(value) = a + b * time by least squares per row and return the trend growth
+# rate exp(b) - 1. Uses every reported value, so it is less sensitive than CAGR to one unusual
+# first or last year. NaN when a reported value is not positive or fewer than MIN_OBSERVATIONS.
+def trend_growth(values, times):
+    values = np.asarray(values, dtype=np.float64)
+    if not values.shape[-1]:
+        return _no_reports(values)
+    reported = np.isfinite(values) & np.isfinite(times)
+    count = reported.sum(axis=-1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        log_values = np.where(reported, np.log(values), 0.0)
+        x = np.where(reported, times, 0.0)
+        x_mean = x.sum(axis=-1) / count
+        y_mean = log_values.sum(axis=-1) / count
+        dx = np.where(reported, x - x_mean[..., None], 0.0)
+        slope = (dx * (log_values - y_mean[..., None])).sum(axis=-1) / (dx * dx).sum(axis=-1)
+        growth = np.expm1(slope)
+    positive = np.all(~reported | (values > 0), axis=-1)
+    return np.where((count >= MIN_OBSERVATIONS) & positive, growth, np.nan)
+
+
+# Function to measure how much year-over-year growth varies: the sample standard deviation of the
+# annualized log growth between consecutive reports. NaN when a reported value is not positive or
+# fewer than MIN_OBSERVATIONS values are reported.
+def growth_volatility(values, times):
+    values = np.asarray(values, dtype=np.float64)
+    if not values.shape[-1]:
+        return _no_reports(values)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # Rows are padded at the start only, so consecutive reported values are adjacent columns
+        log_growth = np.diff(np.log(values), axis=-1) / np.diff(times, axis=-1)
+        reported = np.isfinite(log_growth)
+        count = reported.sum(axis=-1)
+        mean = np.where(reported, log_growth, 0.0).sum(axis=-1) / count
+        variance = (np.where(reported, log_growth - mean[..., None], 0.0) ** 2).sum(axis=-1) / (count - 1)
+    reported_values = np.isfinite(values) & np.isfinite(times)
+    positive = np.all(~reported_values | (values > 0), axis=-1)
+    return np.where((count >= MIN_OBSERVATIONS - 1) & positive, np.sqrt(variance), np.nan)
+
+
+# Function to estimate revenue and FCF growth for many tickers at once
+# columns maps 'revenue' and 'fcf' to arrays shaped (tickers, reports), oldest report first and
+# NaN-padded at the start; report_dates has the same shape (int64 nanoseconds, negative for none).
+# Returns arrays per ticker: CAGR, trend growth and growth volatility of each, the proposed growth
+# rate (first finite estimate in PROPOSAL_ORDER, clipped) and the name of the estimate it came from.
+def estimate_growth(columns, report_dates):
+    times = report_years(report_dates)
+    estimates = {}
+    for field in ('revenue', 'fcf'):
+        values = np.asarray(columns[field], dtype=np.float64)
+        estimates[f'{field}_cagr'] = cagr(values, times)
+        estimates[f'{field}_trend_growth'] = trend_growth(values, times)
+        estimates[f'{field}_growth_volatility'] = growth_volatility(values, times)
+
+    proposed = np.full(times.shape[:-1], np.nan)
+    source = np.full(times.shape[:-1], '', dtype=object)
+    for name in reversed(PROPOSAL_ORDER):
+        finite = np.isfinite(estimates[name])
+        proposed = np.where(finite, estimates[name], proposed)
+        source = np.where(finite, name, source)
+    estimates['proposed_growth'] = np.clip(proposed, MIN_PROPOSED_GROWTH, MAX_PROPOSED_GROWTH)
+    estimates['proposed_growth_source'] = source
+    return estimates
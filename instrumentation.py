@@ -0,0 +1,174 @@
+import json
+import os
+import sys
+import threading
+import time
+
+# Per-stage timing of page runs. Off unless DCF_TRACE is set (or a page turns it on for one
+# session, e.g. with ?debug=1); finished runs are appended to DCF_TRACE_JSONL and summed into a
+# Prometheus textfile at DCF_TRACE_PROM when those paths are set.
+TRACE_ENABLED = os.environ.get('DCF_TRACE', '') not in ('', '0')
+TRACE_JSONL_PATH = os.environ.get('DCF_TRACE_JSONL')
+TRACE_PROM_PATH = os.environ.get('DCF_TRACE_PROM')
+
+# Stages a page run is split into
+STAGES = ('fetch', 'transform', 'valuation', 'render')
+
+
+# Context manager that does nothing; span() returns this one shared instance while tracing is off
+class _NoSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NO_SPAN = _NoSpan()
+
+
+class _Span:
+    def __init__(self, run, stage, name):
+        self.run = run
+        self.stage = stage
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.run.spans.append((self.stage, self.name, self.start - self.run.start, time.perf_counter() - self.start))
+        return False
+
+
+# One traced page run: spans are (stage, name, start offset, duration) in seconds
+class Run:
+    def __init__(self, page):
+        self.page = page
+        self.started_at = time.time()
+        self.start = time.perf_counter()
+        self.spans = []
+        self.duration = None
+
+    # Function to sum span durations per stage (nested spans count in both)
+    def stage_totals(self):
+        totals = dict.fromkeys(STAGES, 0.0)
+        for stage, _, _, duration in self.spans:
+            totals[stage] = totals.get(stage, 0.0) + duration
+        return totals
+
+    def to_dict(self):
+        return {'page': self.page, 'started_at': self.started_at, 'duration': self.duration,
+                'stages': self.stage_totals(),
+                'spans': [{'stage': s, 'name': n, 'offset': o, 'duration': d} for s, n, o, d in self.spans]}
+
+
+# Streamlit runs each session's script on its own thread, so the current run is thread-local
+class _Local(threading.local):
+    run = None
+
+
+_local = _Local()
+
+# Cumulative (page, stage, name) -> (count, seconds) over every finished run, for the Prometheus sink
+_totals = {}
+_runs = {}
+_totals_lock = threading.Lock()
+
+
+# Function to start tracing a page run on this thread; returns None (and traces nothing) when disabled
+def start_run(page, enabled=None):
+    _local.run = Run(page) if (TRACE_ENABLED if enabled is None else enabled) else None
+    return _local.run
+
+
+# Function to time a block as one span of the current run:  with span('fetch', 'info'): ...
+def span(stage, name):
+    run = _local.run
+    if run is None:
+        return _NO_SPAN
+    return _Span(run, stage, name)
+
+
+# Function to end the current run and write it to the configured sinks; returns the run or None
+def finish_run(jsonl_path=None, prom_path=None):
+    run = _local.run
+    _local.run = None
+    if run is None:
+        return None
+    run.duration = time.perf_counter() - run.start
+    with _totals_lock:
+        count, seconds = _runs.get(run.page, (0, 0.0))
+        _runs[run.page] = (count + 1, seconds + run.duration)
+        for stage, name, _, duration in run.spans:
+            count, seconds = _totals.get((run.page, stage, name), (0, 0.0))
+            _totals[run.page, stage, name] = (count + 1, seconds + duration)
+    jsonl_path = jsonl_path or TRACE_JSONL_PATH
+    prom_path = prom_path or TRACE_PROM_PATH
+    if jsonl_path:
+        write_jsonl(run, jsonl_path)
+    if prom_path:
+        write_prometheus(prom_path)
+    return run
+
+
+_jsonl_lock = threading.Lock()
+
+
+# Function to append one run as a JSON line
+def write_jsonl(run, path):
+    line = json.dumps(run.to_dict()) + '\n'
+    with _jsonl_lock, open(path, 'a') as f:
+        f.write(line)
+
+
+def _labels(**labels):
+    return '{' + ','.join(f'{k}="{str(v)}"' for k, v in labels.items()) + '}'
+
+
+# Function to collect the shared cache and fetch scheduler counters, for whichever of them is loaded
+def service_stats():
+    stats = {}
+    if 'data_cache' in sys.modules:
+        stats['memory_cache'] = sys.modules['data_cache'].memory_cache.stats()
+    scheduler_module = sys.modules.get('fetch_scheduler')
+    if scheduler_module is not None and scheduler_module._default_scheduler is not None:
+        stats['fetch_scheduler'] = scheduler_module._default_scheduler.stats()
+    return stats
+
+
+# Function to write cumulative timings (and cache/scheduler counters) in the Prometheus text format,
+# replacing the file atomically as the node_exporter textfile collector expects
+def write_prometheus(path):
+    with _totals_lock:
+        totals = sorted(_totals.items())
+        runs = sorted(_runs.items())
+    lines = ['# HELP dcf_page_runs_total Traced page runs.', '# TYPE dcf_page_runs_total counter']
+    lines += [f'dcf_page_runs_total{_labels(page=page)} {count}' for page, (count, _) in runs]
+    lines += ['# HELP dcf_page_seconds_total Time spent in traced page runs.', '# TYPE dcf_page_seconds_total counter']
+    lines += [f'dcf_page_seconds_total{_labels(page=page)} {seconds:.6f}' for page, (_, seconds) in runs]
+    lines += ['# HELP dcf_span_calls_total Spans recorded per page, stage and name.', '# TYPE dcf_span_calls_total counter']
+    lines += [f'dcf_span_calls_total{_labels(page=p, stage=s, name=n)} {count}' for (p, s, n), (count, _) in totals]
+    lines += ['# HELP dcf_span_seconds_total Time spent per page, stage and name.', '# TYPE dcf_span_seconds_total counter']
+    lines += [f'dcf_span_seconds_total{_labels(page=p, stage=s, name=n)} {seconds:.6f}' for (p, s, n), (_, seconds) in totals]
+    for service, stats in service_stats().items():
+        for key, value in stats.items():
+            lines.append(f'dcf_{service}_{key} {value}')
+    tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(tmp_path, 'w') as f:
+        f.write('\n'.join(lines) + '\n')
+    os.replace(tmp_path, path)
+
+
+# Function to show a finished run in a collapsible panel at the bottom of the page
+def debug_panel(run):
+    import pandas as pd
+    import streamlit as st
+    with st.expander(f'Debug: {run.page} ran in {run.duration * 1000:.1f} ms', expanded=False):
+        st.table(pd.DataFrame({'Stage': list(run.stage_totals()),
+                               'Time (ms)': [t * 1000 for t in run.stage_totals().values()]}))
+        st.dataframe(pd.DataFrame([(s, n, o * 1000, d * 1000) for s, n, o, d in run.spans],
+                                  columns=['Stage', 'Span', 'Start (ms)', 'Time (ms)']))
+        for service, stats in service_stats().items():
+            st.write(f'**{service}**', stats)
@@ -0,0 +1,95 @@
+import numpy as np
+
+from dcf_engine import calculate_dcf_value
+from valuation import calculate_wacc
+
+# Order of the sampled inputs, which is also the row/column order of the correlation matrix
+VARIABLES = ('growth_rate', 'cost_of_equity', 'cost_of_debt', 'terminal_growth_rate')
+
+# Number of paths valued at once; bounds the working memory of a simulation
+CHUNK_SIZE = 1_000_000
+
+DEFAULT_PERCENTILES = (5, 10, 25, 50, 75, 90, 95)
+
+
+# Function to map correlated standard normal draws onto a marginal distribution
+# Supported: normal (mean, std), lognormal (mean, sigma of the log), uniform (low, high),
+# triangular (low, mode, high). Non-normal marginals go through a Gaussian copula.
+def _transform(z, spec):
+    dist = spec.get('dist', 'normal')
+    if dist == 'normal':
+        return spec['mean'] + spec['std'] * z
+    if dist == 'lognormal':
+        return np.exp(np.log(spec['mean']) - spec['sigma'] ** 2 / 2 + spec['sigma'] * z)
+    from scipy.special import ndtr
+    u = ndtr(z)
+    if dist == 'uniform':
+        return spec['low'] + (spec['high'] - spec['low']) * u
+    if dist == 'triangular':
+        low, mode, high = spec['low'], spec['mode'], spec['high']
+        split = (mode - low) / (high - low)
+        return np.where(u < split,
+                        low + np.sqrt(u * (high - low) * (mode - low)),
+                        high - np.sqrt((1 - u) * (high - low) * (high - mode)))
+    raise ValueError(f'Unknown distribution: {dist}')
+
+
+# Tolerance for treating a slightly negative eigenvalue of a correlation matrix as rounding error
+PSD_TOLERANCE = 1e-10
+
+
+# Function to factor a correlation matrix C as L @ L.T through its eigendecomposition
+# Unlike Cholesky this also works for singular matrices (correlations of exactly +-1): eigenvalues
+# within rounding of zero are clipped to zero. Matrices that are not symmetric positive semidefinite
+# raise ValueError.
+def correlation_root(correlation):
+    correlation = np.asarray(correlation, dtype=np.float64)
+    if correlation.ndim != 2 or correlation.shape[0] != correlation.shape[1]:
+        raise ValueError('Correlation matrix must be square')
+    if not np.allclose(correlation, correlation.T):
+        raise ValueError('Correlation matrix must be symmetric')
+    eigenvalues, eigenvectors = np.linalg.eigh(correlation)
+    if eigenvalues.min() < -PSD_TOLERANCE * max(1.0, eigenvalues.max()):
+        raise ValueError('Correlation matrix is not positive semidefinite; these correlations cannot occur together')
+    return eigenvectors * np.sqrt(np.clip(eigenvalues, 0, None))
+
+
+# Function to draw correlated samples of the DCF inputs
+def sample_inputs(distributions, n, correlation=None, rng=None):
+    rng = rng or np.random.default_rng()
+    z = rng.standard_normal((len(VARIABLES), n))
+    if correlation is not None:
+        z = correlation_root(correlation) @ z
+    return {name: _transform(z[i], distributions[name]) for i, name in enumerate(VARIABLES)}
+
+
+# Function to run a Monte Carlo DCF and summarize fair value per share
+# distributions maps each name in VARIABLES to a spec for _transform.
+# Paths where WACC does not exceed the terminal growth rate have no finite value and are dropped.
+# value_function values a batch as calculate_dcf_value does, e.g. a partial of
+# dcf_engine.calculate_multistage_value for a fade to terminal growth.
+def run_monte_carlo(fcf, num_years, equity_value, debt_value, tax_rate, shares_outstanding,
+                    distributions, correlation=None, n_paths=1_000_000, percentiles=DEFAULT_PERCENTILES,
+                    chunk_size=CHUNK_SIZE, seed=None, value_function=calculate_dcf_value):
+    rng = np.random.default_rng(seed)
+    # Only the per-path result (float32) is kept; all intermediates are per chunk
+    values = np.empty(n_paths, dtype=np.float32)
+    n_valid = 0
+    for start in range(0, n_paths, chunk_size):
+        n = min(chunk_size, n_paths - start)
+        draws = sample_inputs(distributions, n, correlation, rng)
+        wacc = calculate_wacc(equity_value, debt_value, draws['cost_of_equity'], draws['cost_of_debt'], tax_rate)
+        valid = wacc > draws['terminal_growth_rate']
+        total_value = value_function(fcf, draws['growth_rate'][valid], wacc[valid],
+                                     draws['terminal_growth_rate'][valid], num_years)
+        values[n_valid:n_valid + total_value.size] = total_value / shares_outstanding
+        n_valid += total_value.size
+
+    values = values[:n_valid]
+    return {
+        'percentiles': dict(zip(percentiles, np.percentile(values, percentiles).tolist())) if n_valid else {},
+        'mean': float(values.mean(dtype=np.float64)) if n_valid else np.nan,
+        'n_paths': n_paths,
+        'n_valid': n_valid,
+        'values': values,
+    }
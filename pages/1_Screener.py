@@ -0,0 +1,27 @@
+import streamlit as st
+from screener import DEFAULT_ASSUMPTIONS, screen
+
+# Streamlit interface
+st.title('Stock Valuation Screener')
+
+tickers = st.text_area('Enter stock tickers (comma or newline separated)', 'AAPL, MSFT, GOOGL, AMZN, NVDA')
+
+# User input for DCF assumptions applied to every ticker
+st.subheader('Assumptions')
+assumptions = {
+    'growth_rate': st.number_input('Annual growth rate (%)', value=DEFAULT_ASSUMPTIONS['growth_rate'] * 100) / 100,
+    'terminal_growth_rate': st.number_input('Terminal growth rate (%)', value=DEFAULT_ASSUMPTIONS['terminal_growth_rate'] * 100) / 100,
+    'num_years': st.number_input('Number of years', min_value=1, value=DEFAULT_ASSUMPTIONS['num_years'], step=1),
+    'tax_rate': st.number_input('Corporate tax rate (%)', value=DEFAULT_ASSUMPTIONS['tax_rate'] * 100) / 100,
+    'cost_of_equity': st.number_input('Cost of equity (%)', value=DEFAULT_ASSUMPTIONS['cost_of_equity'] * 100) / 100,
+    'cost_of_debt': st.number_input('Cost of debt (%)', value=DEFAULT_ASSUMPTIONS['cost_of_debt'] * 100) / 100,
+    'industry_ps_ratio': st.number_input('Industry Price to Sales (P/S) ratio', value=DEFAULT_ASSUMPTIONS['industry_ps_ratio']),
+}
+max_workers = st.slider('Concurrent requests', 1, 64, 16)
+
+if st.button('Run Screener'):
+    ticker_list = tickers.replace(',', '\n').splitlines()
+    with st.spinner(f'Fetching and valuing {len(ticker_list)} tickers...'):
+        results = screen(ticker_list, assumptions, max_workers=max_workers)
+    st.dataframe(results)
+    st.download_button('Download CSV', results.to_csv(index=False), 'screener.csv', 'text/csv')
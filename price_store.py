@@ -0,0 +1,126 @@
+import json
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from fetch_scheduler import scheduled
+from providers import _period_offset, get_provider
+
+STORE_DIR = os.environ.get('DCF_PRICE_STORE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'dcf', 'prices'))
+
+# How long (seconds) a ticker's stored history counts as current before its tail is refreshed
+REFRESH_INTERVAL = 15 * 60
+
+
+# Local columnar store of daily price history, one memory-mapped NumPy record array per ticker.
+# A ticker is downloaded in full once; later refreshes only request the bars after the last
+# stored date (re-fetching that day, whose bar may have been partial) and append them.
+class PriceStore:
+    def __init__(self, root=STORE_DIR, provider=None, refresh_interval=REFRESH_INTERVAL):
+        self.root = root
+        self.provider = provider or scheduled(get_provider())
+        self.refresh_interval = refresh_interval
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def _lock(self, ticker):
+        with self._locks_guard:
+            return self._locks.setdefault(ticker, threading.Lock())
+
+    def _paths(self, ticker):
+        base = os.path.join(self.root, ticker.upper())
+        return base + '.npy', base + '.json'
+
+    # Function to load a ticker's stored bars (memory-mapped) and metadata, or (None, None)
+    def load(self, ticker):
+        data_path, meta_path = self._paths(ticker)
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+            return np.load(data_path, mmap_mode='r'), meta
+        except (OSError, ValueError):
+            return None, None
+
+    def _save(self, ticker, records, meta):
+        data_path, meta_path = self._paths(ticker)
+        for path, write in ((data_path, lambda f: np.save(f, records)),
+                            (meta_path, lambda f: f.write(json.dumps(meta).encode()))):
+            tmp_path = f'{path}.{threading.get_ident()}.tmp'
+            with open(tmp_path, 'wb') as f:
+                write(f)
+            os.replace(tmp_path, path)
+
+    # Function to pack a history DataFrame into a record array with int64 UTC nanosecond dates
+    @staticmethod
+    def _to_records(hist):
+        index = hist.index if hist.index.tz is not None else hist.index.tz_localize('UTC')
+        columns = [c for c in hist.columns if pd.api.types.is_numeric_dtype(hist[c])]
+        records = np.empty(len(hist), dtype=[('date', 'i8')] + [(c, 'f8') for c in columns])
+        records['date'] = index.tz_convert('UTC').as_unit('ns').asi8
+        for c in columns:
+            records[c] = hist[c].to_numpy(dtype=np.float64)
+        return records
+
+    @staticmethod
+    def _to_frame(records, tz):
+        index = pd.DatetimeIndex(pd.to_datetime(records['date'], utc=True), name='Date')
+        columns = [c for c in records.dtype.names if c != 'date']
+        return pd.DataFrame({c: records[c] for c in columns}, index=index.tz_convert(tz) if tz else index)
+
+    # Function to tell whether stored bars reach back far enough for a period
+    @staticmethod
+    def _covers(records, meta, period):
+        if meta['period'] == 'max' or period == meta['period']:
+            return True
+        offset = _period_offset(period)
+        if offset is None or not len(records):
+            return False
+        first, last = (pd.Timestamp(int(d), tz='UTC') for d in (records['date'][0], records['date'][-1]))
+        # Allow a week of slack for weekends and holidays at the start of the period
+        return first <= last - offset + pd.Timedelta(days=7)
+
+    # Function to bring a ticker's stored history up to date, downloading only what is missing
+    def refresh(self, ticker, period='5y', force=False):
+        with self._lock(ticker):
+            records, meta = self.load(ticker)
+            if records is not None and not self._covers(records, meta, period):
+                records = None
+            if records is not None and not force and time.time() - meta['refreshed_at'] < self.refresh_interval:
+                return records, meta
+
+            if records is None or not len(records):
+                hist = self.provider.history(ticker, period=period)
+                if hist.empty:
+                    raise LookupError(f'No price history for {ticker}')
+                meta = {'tz': str(hist.index.tz) if hist.index.tz is not None else None, 'period': period}
+                records = self._to_records(hist)
+            else:
+                last_date = pd.Timestamp(int(records['date'][-1]), tz='UTC').tz_convert(meta['tz'] or 'UTC')
+                tail_hist = self.provider.history_range(ticker, start=last_date.normalize())
+                # An empty tail (no new bars, or a failed download, which yfinance also reports as an
+                # empty frame) keeps the stored bars; the next refresh asks again
+                tail = self._to_records(tail_hist) if not tail_hist.empty else None
+                if tail is not None and tail.dtype != records.dtype:
+                    # Columns changed upstream; start over with a full download
+                    hist = self.provider.history(ticker, period=meta['period'])
+                    if not hist.empty:
+                        records = self._to_records(hist)
+                elif tail is not None:
+                    records = np.concatenate([records[records['date'] < tail['date'][0]], tail])
+            meta['refreshed_at'] = time.time()
+            self._save(ticker, records, meta)
+            return self.load(ticker)
+
+    # Function to return a ticker's price history for a yfinance-style period, refreshing if stale
+    def history(self, ticker, period='5y'):
+        records, meta = self.refresh(ticker, period)
+        hist = self._to_frame(records, meta['tz'])
+        offset = _period_offset(period)
+        if offset is not None and len(hist):
+            hist = hist[hist.index > hist.index[-1] - offset]
+        return hist
+
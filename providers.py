@@ -0,0 +1,208 @@
+import json
+import os
+import re
+import time
+
+# Market data provider used when none is given, e.g. DCF_PROVIDER=local:/path/to/snapshots
+DEFAULT_PROVIDER = os.environ.get('DCF_PROVIDER', 'yfinance')
+
+
+# Function to turn a yfinance period such as '5y' or '6mo' into a date offset (None for 'max'/'ytd')
+def _period_offset(period):
+    match = re.fullmatch(r'(\d+)(d|wk|mo|y)', period)
+    if not match:
+        return None
+    import pandas as pd
+    unit = {'d': 'days', 'wk': 'weeks', 'mo': 'months', 'y': 'years'}[match.group(2)]
+    return pd.DateOffset(**{unit: int(match.group(1))})
+
+
+# Raised when the upstream source throttles a request (HTTP 429); schedulers back off on it
+class RateLimitError(Exception):
+    pass
+
+
+# Interface every market data source implements: info dict, price history and annual statements
+# (income statement as financials, cash flow, balance sheet; line items as rows, report dates as columns)
+class MarketDataProvider:
+    # Whether responses are worth keeping in the on-disk cache (false for local snapshots)
+    cacheable = True
+
+    # Whether calls go to a throttled upstream and should pass through the fetch scheduler
+    rate_limited = True
+
+    # Identity of the data source, so identical requests through different instances can be merged
+    @property
+    def source(self):
+        return f'{type(self).__name__}@{id(self):x}'
+
+    def info(self, ticker):
+        raise NotImplementedError
+
+    def history(self, ticker, period='5y'):
+        raise NotImplementedError
+
+    def financials(self, ticker):
+        raise NotImplementedError
+
+    def cashflow(self, ticker):
+        raise NotImplementedError
+
+    def balance_sheet(self, ticker):
+        raise NotImplementedError
+
+    # Price bars from start (inclusive) to end; providers with a native range query override this
+    def history_range(self, ticker, start, end=None):
+        hist = self.history(ticker, period='max')
+        hist = hist[hist.index >= start]
+        return hist if end is None else hist[hist.index < end]
+
+
+# pandas (like yfinance below) is imported inside the methods that use it, so importing this
+# module on a page's cold start stays cheap
+
+# Live data from Yahoo Finance through yfinance
+class YFinanceProvider(MarketDataProvider):
+    source = 'yfinance'
+
+    def __init__(self):
+        self._tickers = {}
+
+    def _ticker(self, ticker):
+        import yfinance as yf
+        if ticker not in self._tickers:
+            self._tickers[ticker] = yf.Ticker(ticker)
+        return self._tickers[ticker]
+
+    # Function to read an attribute or call a method of a yf.Ticker, reporting throttling as RateLimitError
+    def _fetch(self, ticker, name, **kwargs):
+        try:
+            value = getattr(self._ticker(ticker), name)
+            return value(**kwargs) if kwargs else value
+        except Exception as e:
+            if type(e).__name__ == 'YFRateLimitError' or 'Too Many Requests' in str(e) or '429' in str(e):
+                raise RateLimitError(str(e)) from e
+            raise
+
+    def info(self, ticker):
+        return self._fetch(ticker, 'info')
+
+    def history(self, ticker, period='5y'):
+        return self._fetch(ticker, 'history', period=period)
+
+    def history_range(self, ticker, start, end=None):
+        return self._fetch(ticker, 'history', start=start, end=end)
+
+    def financials(self, ticker):
+        return self._fetch(ticker, 'financials')
+
+    def cashflow(self, ticker):
+        return self._fetch(ticker, 'cashflow')
+
+    def balance_sheet(self, ticker):
+        return self._fetch(ticker, 'balance_sheet')
+
+
+# Offline data from snapshot files laid out as
+# <root>/<TICKER>/{info.json, history.*, financials.*, cashflow.*, balance_sheet.*}.
+# Tables are read from Parquet when present, otherwise from JSON. A fixed latency can be added
+# to every call so load tests and benchmarks see deterministic response times.
+class LocalProvider(MarketDataProvider):
+    cacheable = False
+    rate_limited = False
+
+    def __init__(self, root, latency=0.0):
+        self.root = root
+        self.latency = latency
+
+    @property
+    def source(self):
+        return 'local:' + self.root
+
+    def _path(self, ticker, name):
+        return os.path.join(self.root, ticker.upper(), name)
+
+    def _wait(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _read_table(self, ticker, name):
+        import pandas as pd
+        parquet_path = self._path(ticker, name + '.parquet')
+        json_path = self._path(ticker, name + '.json')
+        if os.path.exists(parquet_path):
+            return pd.read_parquet(parquet_path)
+        if os.path.exists(json_path):
+            return pd.read_json(json_path, orient='split', convert_dates=True)
+        raise LookupError(f'No {name} snapshot for {ticker} in {self.root}')
+
+    def info(self, ticker):
+        self._wait()
+        path = self._path(ticker, 'info.json')
+        if not os.path.exists(path):
+            raise LookupError(f'No info snapshot for {ticker} in {self.root}')
+        with open(path) as f:
+            return json.load(f)
+
+    def history(self, ticker, period='5y'):
+        import pandas as pd
+        self._wait()
+        hist = self._read_table(ticker, 'history')
+        hist.index = pd.to_datetime(hist.index)
+        # Snapshots hold the longest history saved; trim to the requested period
+        offset = _period_offset(period)
+        if offset is not None and len(hist):
+            hist = hist[hist.index > hist.index[-1] - offset]
+        return hist
+
+    def _statement(self, ticker, name):
+        import pandas as pd
+        self._wait()
+        # Stored with report dates as rows, since Parquet needs string column names
+        statement = self._read_table(ticker, name)
+        statement.index = pd.to_datetime(statement.index)
+        return statement.transpose()
+
+    def financials(self, ticker):
+        return self._statement(ticker, 'financials')
+
+    def cashflow(self, ticker):
+        return self._statement(ticker, 'cashflow')
+
+    def balance_sheet(self, ticker):
+        return self._statement(ticker, 'balance_sheet')
+
+
+# Function to write a provider's data for a ticker as local snapshot files
+def save_snapshot(provider, ticker, root, period='5y', fmt='json'):
+    directory = os.path.join(root, ticker.upper())
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, 'info.json'), 'w') as f:
+        json.dump(provider.info(ticker), f, default=str)
+    tables = {
+        'history': provider.history(ticker, period=period),
+        'financials': provider.financials(ticker).transpose(),
+    }
+    # Cash flow and balance sheet are optional; not every source has them
+    for name in ('cashflow', 'balance_sheet'):
+        try:
+            tables[name] = getattr(provider, name)(ticker).transpose()
+        except (NotImplementedError, LookupError):
+            pass
+    for name, table in tables.items():
+        table = table.copy()
+        table.columns = [str(c) for c in table.columns]
+        if fmt == 'parquet':
+            table.to_parquet(os.path.join(directory, name + '.parquet'))
+        else:
+            table.to_json(os.path.join(directory, name + '.json'), orient='split', date_format='iso')
+
+
+# Function to build a provider from a spec such as 'yfinance' or 'local:/path/to/snapshots'
+def get_provider(spec=None):
+    spec = spec or DEFAULT_PROVIDER
+    if spec == 'yfinance':
+        return YFinanceProvider()
+    if spec.startswith('local:'):
+        return LocalProvider(spec[len('local:'):], latency=float(os.environ.get('DCF_PROVIDER_LATENCY', 0)))
+    raise ValueError(f'Unknown market data provider: {spec}')
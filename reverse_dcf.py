@@ -0,0 +1,64 @@
+import numpy as np
+
+from dcf_engine import calculate_dcf_value
+
+# Lowest rate the solver will try: just above -100%
+MIN_RATE = -0.99
+
+
+# Function to find roots of an increasing or decreasing vectorized function on [low, high]
+# Newton steps (with a central-difference slope) are taken when they stay inside the current
+# bracket, otherwise the bracket is bisected, so every element converges independently.
+# Elements whose bracket has no sign change, or whose function is not finite there, give NaN.
+def solve_bracketed(f, low, high, tol=1e-10, max_iter=100):
+    low, high = [np.array(a, dtype=np.float64) for a in np.broadcast_arrays(low, high)]
+    f_low, f_high = f(low), f(high)
+    solvable = np.isfinite(f_low) & np.isfinite(f_high) & (np.sign(f_low) != np.sign(f_high))
+    x = (low + high) / 2
+    for _ in range(max_iter):
+        f_x = f(x)
+        on_low_side = np.sign(f_x) == np.sign(f_low)
+        low = np.where(on_low_side, x, low)
+        f_low = np.where(on_low_side, f_x, f_low)
+        high = np.where(on_low_side, high, x)
+
+        h = 1e-7 * np.maximum(1, np.abs(x))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            slope = (f(x + h) - f(x - h)) / (2 * h)
+            newton = x - f_x / slope
+        inside = np.isfinite(newton) & (newton > low) & (newton < high)
+        x_next = np.where(inside, newton, (low + high) / 2)
+        converged = (np.abs(x_next - x) <= tol) | (f_x == 0) | ~solvable
+        x = x_next
+        if np.all(converged):
+            break
+    root = np.where(solvable, x, np.nan)
+    return root if root.ndim else float(root)
+
+
+# Function to solve for the FCF growth rate at which DCF value per share equals the market price
+def implied_growth_rate(price, shares_outstanding, fcf, wacc, terminal_growth_rate, num_years,
+                        low=MIN_RATE, high=1.0, stub=1.0, mid_year=False):
+    target = np.asarray(price, dtype=np.float64) * shares_outstanding
+
+    def error(growth_rate):
+        with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+            return calculate_dcf_value(fcf, growth_rate, wacc, terminal_growth_rate, num_years,
+                                       stub, mid_year) / target - 1
+
+    return solve_bracketed(error, np.broadcast_to(low, np.broadcast(target, wacc).shape), high)
+
+
+# Function to solve for the WACC at which DCF value per share equals the market price
+# The search starts just above the terminal growth rate, where the terminal value diverges.
+def implied_wacc(price, shares_outstanding, fcf, growth_rate, terminal_growth_rate, num_years, high=1.0,
+                 stub=1.0, mid_year=False):
+    target = np.asarray(price, dtype=np.float64) * shares_outstanding
+    low = np.asarray(terminal_growth_rate, dtype=np.float64) + 1e-9
+
+    def error(wacc):
+        with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+            return calculate_dcf_value(fcf, growth_rate, wacc, terminal_growth_rate, num_years,
+                                       stub, mid_year) / target - 1
+
+    return solve_bracketed(error, np.broadcast_to(low, np.broadcast(target, low).shape), high)
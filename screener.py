@@ -0,0 +1,144 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from data_cache import CachedTicker, DiskCache
+from dcf_engine import calculate_dcf_value
+from fetch_scheduler import BATCH, FETCH_RATE, FETCH_RETRIES, FetchScheduler, scheduled
+from providers import get_provider
+from reverse_dcf import implied_growth_rate
+from valuation import calculate_wacc, calculate_ps_valuation
+
+# Default DCF assumptions, the same as the DCF2.py inputs
+DEFAULT_ASSUMPTIONS = {
+    'growth_rate': 0.05,
+    'terminal_growth_rate': 0.02,
+    'num_years': 5,
+    'tax_rate': 0.21,
+    'cost_of_equity': 0.08,
+    'cost_of_debt': 0.05,
+    'industry_ps_ratio': 1.5,
+}
+
+
+# Function to fetch one ticker's info (and optionally price history) for the screener
+def fetch_ticker(ticker, provider, cache, history_period=None):
+    stock = CachedTicker(ticker, cache=cache, provider=provider)
+    row = {'ticker': ticker}
+    try:
+        row['info'] = stock.info
+        if history_period:
+            hist = stock.history(period=history_period)
+            row['price_return'] = hist['Close'].iloc[-1] / hist['Close'].iloc[0] - 1 if len(hist) else np.nan
+    except Exception as e:
+        row['error'] = f'{type(e).__name__}: {e}'
+    return row
+
+
+# Function to read one field from a mapping of columns (dict of arrays or FundamentalsSnapshot),
+# filling missing values with default; columns without missing values are used as-is, without copying
+def _field(fundamentals, key, n, default=np.nan):
+    if key not in fundamentals:
+        return np.full(n, default)
+    values = np.asarray(fundamentals[key], dtype=np.float64)
+    if not np.isnan(default) and np.isnan(values).any():
+        values = np.where(np.isnan(values), default, values)
+    return values
+
+
+# Function to value a universe held as columns, using DCF or the P/S fallback when PE and FCF are negative
+# stub is the first period's length in years (per row or shared), see dcf_engine.stub_period.
+def value_fundamentals(fundamentals, n, assumptions=None, stub=1.0):
+    a = dict(DEFAULT_ASSUMPTIONS, **(assumptions or {}))
+    if a['num_years'] < 1:
+        raise ValueError('Number of years must be at least 1')
+    pe_ratio = _field(fundamentals, 'trailingPE', n)
+    fcf = _field(fundamentals, 'freeCashflow', n)
+    shares = _field(fundamentals, 'sharesOutstanding', n, 1)
+    price = _field(fundamentals, 'currentPrice', n)
+    # Same rule as DCF2.py: P/S when PE is missing or negative and FCF is negative
+    use_ps = (np.isnan(pe_ratio) | (pe_ratio < 0)) & (fcf < 0)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        wacc = calculate_wacc(_field(fundamentals, 'marketCap', n, 0), _field(fundamentals, 'totalDebt', n, 0),
+                              a['cost_of_equity'], a['cost_of_debt'], a['tax_rate'])
+        dcf_value = calculate_dcf_value(fcf, a['growth_rate'], wacc, a['terminal_growth_rate'], a['num_years'], stub=stub)
+        ps_value = calculate_ps_valuation(_field(fundamentals, 'totalRevenue', n, 0), a['industry_ps_ratio'])
+        fair_value = np.where(use_ps, ps_value, dcf_value)
+        fair_value_per_share = fair_value / shares
+        implied_growth = implied_growth_rate(price, shares, fcf, wacc, a['terminal_growth_rate'], a['num_years'], stub=stub)
+        upside = fair_value_per_share / price - 1
+
+    return {
+        'method': np.where(use_ps, 'P/S', 'DCF'),
+        'price': price,
+        'wacc': np.where(use_ps, np.nan, wacc),
+        'fair_value': fair_value,
+        'fair_value_per_share': fair_value_per_share,
+        'upside': upside,
+        'implied_growth': np.where(use_ps, np.nan, implied_growth),
+    }
+
+
+# Function to value fetched tickers (rows from fetch_ticker)
+def value_tickers(rows, assumptions=None):
+    infos = [row.get('info') or {} for row in rows]
+    keys = {key for info in infos for key, value in info.items() if isinstance(value, (int, float))}
+    fundamentals = {key: np.array([info.get(key) if isinstance(info.get(key), (int, float)) else np.nan
+                                   for info in infos], dtype=np.float64) for key in keys}
+    result = pd.DataFrame({
+        'ticker': [row['ticker'] for row in rows],
+        'name': [info.get('shortName') for info in infos],
+        **value_fundamentals(fundamentals, len(rows), assumptions),
+    })
+    if any('price_return' in row for row in rows):
+        result['price_return'] = [row.get('price_return', np.nan) for row in rows]
+    result['error'] = [row.get('error') for row in rows]
+    # Tickers whose data could not be fetched keep their row, with the error and no values
+    failed = result['error'].notna()
+    result.loc[failed, ['method', 'wacc', 'fair_value', 'fair_value_per_share', 'upside', 'implied_growth']] = np.nan
+    return result
+
+
+# Function to value every ticker in a fundamentals snapshot straight from its memory-mapped columns
+# With estimated_growth, each ticker's growth rate is the one proposed from its statement history
+# (see growth.estimate_growth), falling back to the assumed growth rate where none can be estimated.
+def value_snapshot(snapshot, assumptions=None, estimated_growth=False):
+    a = dict(DEFAULT_ASSUMPTIONS, **(assumptions or {}))
+    columns = {}
+    if estimated_growth and snapshot.statements is not None:
+        from growth import estimate_growth
+        proposed = estimate_growth({field: snapshot.statement(field) for field in ('revenue', 'fcf')},
+                                   snapshot.report_dates)['proposed_growth']
+        a['growth_rate'] = np.where(np.isfinite(proposed), proposed, a['growth_rate'])
+        columns['growth_rate'] = a['growth_rate']
+    result = pd.DataFrame({'ticker': np.asarray(snapshot.tickers).astype(str), **columns,
+                           **value_fundamentals(snapshot, len(snapshot), a)})
+    return result.sort_values('upside', ascending=False, ignore_index=True)
+
+
+# Function to fetch info (and optionally history) for many tickers on a bounded thread pool
+# Upstream calls go through the fetch scheduler's batch lane, so interactive page loads overtake them.
+# rate and retries give this run its own scheduler instead of the process-wide one.
+def fetch_universe(tickers, provider=None, cache=None, max_workers=16, rate=None, retries=None, history_period=None):
+    scheduler = None
+    if rate is not None or retries is not None:
+        scheduler = FetchScheduler(rate=FETCH_RATE if rate is None else rate, burst=max(1, int(rate or FETCH_RATE)),
+                                   workers=max_workers, retries=FETCH_RETRIES if retries is None else retries)
+    provider = scheduled(provider or get_provider(), BATCH, scheduler)
+    cache = cache or DiskCache()
+    tickers = list(dict.fromkeys(t.strip().upper() for t in tickers if t.strip()))
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(lambda t: fetch_ticker(t, provider, cache, history_period), tickers))
+    finally:
+        if scheduler is not None:
+            scheduler.shutdown()
+
+
+# Function to screen a list of tickers: fetch concurrently, value, and return one sortable DataFrame
+def screen(tickers, assumptions=None, max_workers=16, rate=None, retries=None,
+           history_period=None, provider=None, cache=None):
+    rows = fetch_universe(tickers, provider, cache, max_workers, rate, retries, history_period)
+    return value_tickers(rows, assumptions).sort_values('upside', ascending=False, ignore_index=True)
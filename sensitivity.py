@@ -0,0 +1,101 @@
+import io
+
+import numpy as np
+import pandas as pd
+
+from dcf_engine import calculate_fair_value_grid
+
+# Largest grid side that still gets the value written in each heatmap cell
+MAX_ANNOTATED_SIZE = 12
+
+# Most tick labels drawn per axis; text layout dominates render time on large grids
+MAX_TICK_LABELS = 10
+
+# Colormap of every heatmap, red for the lowest values and green for the highest
+HEATMAP_CMAP = 'RdYlGn'
+
+# Fixed figure margins (fractions of the 8 x 6 inch figure) with room for the axis labels, so
+# saving needs no bbox_inches='tight', which draws the whole figure an extra time to measure it
+HEATMAP_MARGINS = dict(left=0.1, right=0.97, bottom=0.13, top=0.94)
+
+# Largest annotation font size in points, and the width of an annotation character in ems (digits
+# are about 0.64 em in the default font), used to shrink the font until every value fits its cell
+ANNOTATION_FONT_SIZE = 10
+ANNOTATION_CHAR_WIDTH = 0.7
+
+# Cell luminance below which annotations are written in white rather than black
+ANNOTATION_LUMINANCE = 0.408
+
+# Matplotlib settings while rendering heatmaps: unhinted glyphs rasterize about twice as fast,
+# and glyphs are most of the work on annotated grids
+HEATMAP_RC = {'text.hinting': 'none'}
+
+
+# Function to value every combination of growth, discount and terminal growth rates in one call
+# Returns an array shaped (len(growth_rates), len(discount_rates), len(terminal_growth_rates));
+# cells where the discount rate does not exceed terminal growth have no finite value and are NaN.
+# Without a value_function this is the single-stage calculate_fair_value model, valued with
+# calculate_fair_value_grid; other models are called once with the three rate axes broadcast.
+def sensitivity_grid(fcf, growth_rates, discount_rates, terminal_growth_rates, years=5, value_function=None):
+    growth = np.asarray(growth_rates, dtype=np.float64)[:, None, None]
+    discount = np.asarray(discount_rates, dtype=np.float64)[None, :, None]
+    terminal_growth = np.asarray(terminal_growth_rates, dtype=np.float64)[None, None, :]
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        if value_function is None:
+            values = calculate_fair_value_grid(fcf, growth_rates, discount_rates, terminal_growth_rates, years)
+        else:
+            values = value_function(fcf, growth, discount, terminal_growth, years)
+    return np.where(discount > terminal_growth, values, np.nan)
+
+
+# Function to build a discount rate x terminal growth table at a single growth rate
+def sensitivity_table(fcf, growth_rate, discount_rates, terminal_growth_rates, years=5, scale=1.0,
+                      value_function=None):
+    values = sensitivity_grid(fcf, [growth_rate], discount_rates, terminal_growth_rates, years, value_function)[0]
+    return pd.DataFrame(values * scale,
+                        index=pd.Index(np.round(np.asarray(discount_rates) * 100, 2), name='Discount Rate (%)'),
+                        columns=pd.Index(np.round(np.asarray(terminal_growth_rates) * 100, 2), name='Terminal Growth Rate (%)'))
+
+
+# Function to draw a sensitivity table as a heatmap, the lowest discount rate at the bottom
+# Every grid is one imshow image with thinned tick labels. Small grids get each cell's value written
+# on it (a colorbar would repeat them); larger ones get a colorbar instead.
+# The figure is created without pyplot, so callers never have to close it; it is freed like any object.
+def plot_sensitivity_heatmap(table, title='Fair Value Sensitivity'):
+    from matplotlib.figure import Figure
+    values = table.to_numpy()
+    fig = Figure(figsize=(8, 6))
+    fig.subplots_adjust(**HEATMAP_MARGINS)
+    ax = fig.subplots()
+    image = ax.imshow(values, cmap=HEATMAP_CMAP, origin='lower', aspect='auto', interpolation='nearest')
+    if max(table.shape) <= MAX_ANNOTATED_SIZE:
+        # Relative luminance of each cell's colour decides the text colour, as seaborn's annot does
+        rgb = image.to_rgba(values)[..., :3]
+        rgb = np.where(rgb <= 0.03928, rgb / 12.92, ((rgb + 0.055) / 1.055) ** 2.4)
+        luminance = rgb @ [0.2126, 0.7152, 0.0722]
+        labels = np.vectorize('{:.2f}'.format, otypes=[object])(values)
+        cell_width = fig.get_figwidth() * 72 * (HEATMAP_MARGINS['right'] - HEATMAP_MARGINS['left']) / table.shape[1]
+        fontsize = min(ANNOTATION_FONT_SIZE, cell_width / (ANNOTATION_CHAR_WIDTH * max(map(len, labels.ravel()))))
+        for (row, column), value in np.ndenumerate(values):
+            if np.isfinite(value):
+                ax.text(column, row, labels[row, column], ha='center', va='center', fontsize=fontsize,
+                        color='white' if luminance[row, column] < ANNOTATION_LUMINANCE else 'black')
+    else:
+        fig.colorbar(image, ax=ax)
+    xticks = np.arange(0, table.shape[1], -(-table.shape[1] // MAX_TICK_LABELS))
+    yticks = np.arange(0, table.shape[0], -(-table.shape[0] // MAX_TICK_LABELS))
+    ax.set_xticks(xticks, table.columns[xticks], rotation=90)
+    ax.set_yticks(yticks, table.index[yticks])
+    ax.set_xlabel(table.columns.name or '')
+    ax.set_ylabel(table.index.name or '')
+    ax.set_title(title)
+    return fig
+
+
+# Function to render a sensitivity heatmap straight to PNG bytes
+def sensitivity_heatmap_png(table, title='Fair Value Sensitivity'):
+    import matplotlib
+    buffer = io.BytesIO()
+    with matplotlib.rc_context(HEATMAP_RC):
+        plot_sensitivity_heatmap(table, title).savefig(buffer, format='png')
+    return buffer.getvalue()
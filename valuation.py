@@ -0,0 +1,39 @@
+# Function to calculate WACC
+def calculate_wacc(equity_value, debt_value, cost_of_equity, cost_of_debt, tax_rate):
+    total_value = equity_value + debt_value
+    wacc = (equity_value / total_value) * cost_of_equity + (debt_value / total_value) * cost_of_debt * (1 - tax_rate)
+    return wacc
+
+# The DCF functions below wrap the dcf_engine kernels; dcf_engine (and with it NumPy) is imported on
+# first use so that pages importing this module do not load it on cold start.
+
+# Function to calculate the DCF enterprise value only, in O(1) without per-year cash flows
+def calculate_dcf_value(fcf, growth_rate, wacc, terminal_growth_rate, num_years, stub=1.0, mid_year=False):
+    import dcf_engine
+    return dcf_engine.calculate_dcf_value(fcf, growth_rate, wacc, terminal_growth_rate, num_years, stub, mid_year)
+
+# Function to calculate DCF
+# The total comes from the closed form; the per-year discounted FCFs are only built when per_year is set.
+# stub is the length in years of the first period (e.g. the rest of the fiscal year); mid_year discounts
+# each period's cash flow from its middle instead of its end.
+# Scalar inputs give floats and a list of per-year values; array inputs give arrays.
+def calculate_dcf(fcf, growth_rate, wacc, terminal_growth_rate, num_years, per_year=True, stub=1.0, mid_year=False):
+    total_value = calculate_dcf_value(fcf, growth_rate, wacc, terminal_growth_rate, num_years, stub, mid_year)
+    terminal_value = fcf * (1 + growth_rate) ** num_years * (1 + terminal_growth_rate) / (wacc - terminal_growth_rate)
+    discounted_fcf = None
+    if per_year:
+        import dcf_engine
+        discounted_fcf = dcf_engine.calculate_dcf_batch(fcf, growth_rate, wacc, terminal_growth_rate, num_years,
+                                                        stub, mid_year)[1]
+        if discounted_fcf.ndim == 1:
+            discounted_fcf = discounted_fcf.tolist()
+    return total_value, discounted_fcf, terminal_value
+
+# Function to calculate fair value using DCF (year 1 cash flow already includes one year of growth)
+def calculate_fair_value(fcf, growth_rate, discount_rate, terminal_growth_rate, years=5):
+    import dcf_engine
+    return dcf_engine.calculate_fair_value_batch(fcf, growth_rate, discount_rate, terminal_growth_rate, years)
+
+# Function to calculate alternative valuation using Price to Sales ratio
+def calculate_ps_valuation(sales, industry_ps_ratio):
+    return sales * industry_ps_ratio
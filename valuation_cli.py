@@ -0,0 +1,63 @@
+import argparse
+import sys
+
+from providers import get_provider
+from fundamentals_store import FundamentalsSnapshot
+from screener import DEFAULT_ASSUMPTIONS, screen, value_snapshot
+
+
+# Function to read tickers from a file: one or more per line, comma or space separated, '#' starts a comment
+def read_tickers(path):
+    with (sys.stdin if path == '-' else open(path)) as f:
+        tickers = []
+        for line in f:
+            tickers.extend(line.split('#', 1)[0].replace(',', ' ').split())
+    return tickers
+
+
+# Function to write the valuation table as CSV or Parquet, chosen by the file extension
+def write_results(results, path):
+    if path == '-':
+        results.to_csv(sys.stdout, index=False)
+    elif path.endswith('.parquet'):
+        results.to_parquet(path, index=False)
+    else:
+        results.to_csv(path, index=False)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Value a list of tickers with DCF (or P/S when PE and FCF are negative) without Streamlit.')
+    parser.add_argument('tickers', nargs='?', help="file with tickers, or '-' for stdin")
+    parser.add_argument('--snapshot', help='value a fundamentals snapshot directory instead of fetching tickers')
+    parser.add_argument('--estimated-growth', action='store_true',
+                        help="with --snapshot, use each ticker's growth estimated from its statement history")
+    parser.add_argument('-o', '--output', default='-', help="output .csv or .parquet file (default: CSV to stdout)")
+    parser.add_argument('--provider', help="market data provider, e.g. 'yfinance' or 'local:/path/to/snapshots'")
+    parser.add_argument('--workers', type=int, default=16, help='concurrent fetches')
+    parser.add_argument('--rate', type=float, help='max requests per second (default: DCF_FETCH_RATE or 5)')
+    parser.add_argument('--retries', type=int, help='retries per failed fetch (default: DCF_FETCH_RETRIES or 3)')
+    for name, default in DEFAULT_ASSUMPTIONS.items():
+        parser.add_argument('--' + name.replace('_', '-'), type=type(default), default=default, help=f'default: {default}')
+    args = parser.parse_args(argv)
+
+    if args.tickers is None and args.snapshot is None:
+        parser.error('give a tickers file or --snapshot')
+    if args.num_years < 1:
+        parser.error('--num-years must be at least 1')
+
+    assumptions = {name: getattr(args, name) for name in DEFAULT_ASSUMPTIONS}
+    if args.snapshot:
+        write_results(value_snapshot(FundamentalsSnapshot.load(args.snapshot), assumptions, args.estimated_growth),
+                      args.output)
+        return 0
+    results = screen(read_tickers(args.tickers), assumptions, max_workers=args.workers, rate=args.rate,
+                     retries=args.retries, provider=get_provider(args.provider))
+    write_results(results, args.output)
+    failed = results['error'].notna().sum()
+    if failed:
+        print(f'{failed} of {len(results)} tickers could not be valued', file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())